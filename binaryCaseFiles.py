@@ -0,0 +1,102 @@
+######################## PeKa2D-v5 Graphical User Interface (GUI) #########################
+
+# PeKa2D-v5 GUI plugin for QGIS 3
+# © 2025 Sergio Martínez-Aranda. License CC BY-NC-SA 4.0
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+
+###########################################################################################
+
+import numpy as np
+from .compressedFiles import loadCaseFile
+
+# Binary FED/HOTSTART files: 8-byte magic (name + format version), a header
+# of 4 little-endian int32 and fixed-width little-endian records.
+#
+# FED      header: ncells nvertex vertexXcell 0
+#          nodes : id <i4, x <f8, y <f8   (ASCII constants 0.0 0.0 -9999 0 0 omitted)
+#          cells : id <i4, nodes <i4 x vertexXcell, nman <f8, zbed <f8, wsl <f8
+# HOTSTART header: nhydro nsediments ncells 0
+#          data  : <f8 (ncells, nhydro + nsediments), row-major
+FED_MAGIC = b"PK5FED\x00\x01"
+HOTSTART_MAGIC = b"PK5HOT\x00\x01"
+
+# Extension appended to the ASCII file name for the binary version
+BINARY_EXTENSION = ".bin"
+
+FED_NODE_DTYPE = np.dtype([("id", "<i4"), ("xy", "<f8", (2,))])
+
+
+def fedCellDtype(vertexXcell):
+    return np.dtype([
+        ("id", "<i4"), ("nodes", "<i4", (vertexXcell,)),
+        ("nman", "<f8"), ("zbed", "<f8"), ("wsl", "<f8")
+    ])
+
+
+def writeFEDbinary(f, node_ids, node_xy, cells, nman, zbed, wsl):
+    """Write a binary FED file to the open binary stream f"""
+    nvertex = len(node_ids)
+    ncells, vertexXcell = cells.shape
+
+    f.write(FED_MAGIC)
+    f.write(np.array([ncells, nvertex, vertexXcell, 0], dtype="<i4").tobytes())
+
+    nodes = np.empty(nvertex, dtype=FED_NODE_DTYPE)
+    nodes["id"] = node_ids
+    nodes["xy"] = node_xy
+    f.write(nodes.tobytes())
+
+    records = np.empty(ncells, dtype=fedCellDtype(vertexXcell))
+    records["id"] = np.arange(1, ncells + 1)
+    records["nodes"] = cells
+    records["nman"] = nman
+    records["zbed"] = zbed
+    records["wsl"] = wsl
+    f.write(records.tobytes())
+
+
+def readFEDbinary(filename):
+    """
+    Read a binary FED file, plain or compressed. Returns a dict with node_ids, node_xy, cell_ids,
+    cells, nman, zbed and wsl arrays.
+    """
+    with loadCaseFile(filename, binary=True) as f:
+        data = f.read()
+    if data[:8] != FED_MAGIC:
+        raise ValueError(f"{filename} is not a binary FED file")
+
+    ncells, nvertex, vertexXcell, _ = np.frombuffer(data, dtype="<i4", count=4, offset=8).tolist()
+    offset = 24
+    nodes = np.frombuffer(data, dtype=FED_NODE_DTYPE, count=nvertex, offset=offset)
+    offset += nodes.nbytes
+    records = np.frombuffer(data, dtype=fedCellDtype(vertexXcell), count=ncells, offset=offset)
+
+    return {
+        "node_ids": nodes["id"].astype(np.int32),
+        "node_xy": nodes["xy"].astype(np.float64),
+        "cell_ids": records["id"].astype(np.int32),
+        "cells": records["nodes"].astype(np.int32),
+        "nman": records["nman"].astype(np.float64),
+        "zbed": records["zbed"].astype(np.float64),
+        "wsl": records["wsl"].astype(np.float64),
+    }
+
+
+def writeHOTSTARTbinary(f, nhydro, n_sediments, data):
+    """Write a binary HOTSTART file (data: ncells x nvars) to the open binary stream f"""
+    f.write(HOTSTART_MAGIC)
+    f.write(np.array([nhydro, n_sediments, data.shape[0], 0], dtype="<i4").tobytes())
+    f.write(np.ascontiguousarray(data, dtype="<f8").tobytes())
+
+
+def readHOTSTARTbinary(filename):
+    """Read a binary HOTSTART file, plain or compressed. Returns nhydro, n_sediments and the (ncells, nvars) data"""
+    with loadCaseFile(filename, binary=True) as f:
+        data = f.read()
+    if data[:8] != HOTSTART_MAGIC:
+        raise ValueError(f"{filename} is not a binary HOTSTART file")
+
+    nhydro, n_sediments, ncells, _ = np.frombuffer(data, dtype="<i4", count=4, offset=8).tolist()
+    values = np.frombuffer(data, dtype="<f8", count=ncells * (nhydro + n_sediments), offset=24)
+
+    return nhydro, n_sediments, values.reshape(ncells, nhydro + n_sediments).copy()
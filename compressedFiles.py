@@ -0,0 +1,80 @@
+######################## PeKa2D-v5 Graphical User Interface (GUI) #########################
+
+# PeKa2D-v5 GUI plugin for QGIS 3
+# © 2025 Sergio Martínez-Aranda. License CC BY-NC-SA 4.0
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+
+###########################################################################################
+
+import gzip
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Compression of the exported case files -> file extension
+COMPRESSION_EXTENSIONS = {
+    "None": "",
+    "gzip": ".gz",
+    "zstd": ".zst",
+}
+
+# Methods available in this QGIS Python (zstd needs the zstandard package)
+COMPRESSION_METHODS = [m for m in COMPRESSION_EXTENSIONS if m != "zstd" or zstandard is not None]
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def compressedPath(path, compression="None"):
+    """File name of a case file written with the given compression"""
+    return path + COMPRESSION_EXTENSIONS[compression]
+
+
+def openCaseFile(path, mode="w", compression="None"):
+    """
+    Open a case file for writing ("w" text or "wb" binary). Compressed files
+    are streamed through the compressor as the chunks are written, without
+    a temporary uncompressed copy. path must already carry the extension
+    (see compressedPath).
+    """
+    if compression == "gzip":
+        if "b" in mode:
+            return gzip.open(path, mode, compresslevel=GZIP_LEVEL)
+        return gzip.open(path, mode + "t", compresslevel=GZIP_LEVEL, encoding="utf-8")
+
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd compression needs the zstandard Python package")
+        cctx = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        if "b" in mode:
+            return zstandard.open(path, mode, cctx=cctx)
+        return zstandard.open(path, mode + "t", cctx=cctx, encoding="utf-8")
+
+    return open(path, mode)
+
+
+def loadCaseFile(path, binary=False):
+    """
+    Open an exported case file for reading, plain or compressed. The
+    compression is detected from the file header, not from the extension.
+    """
+    with open(path, "rb") as f:
+        magic = f.read(4)
+
+    if magic.startswith(GZIP_MAGIC):
+        if binary:
+            return gzip.open(path, "rb")
+        return gzip.open(path, "rt", encoding="utf-8")
+
+    if magic.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            raise RuntimeError("zstd compressed file needs the zstandard Python package")
+        if binary:
+            return zstandard.open(path, "rb")
+        return zstandard.open(path, "rt", encoding="utf-8")
+
+    return open(path, "rb" if binary else "r")
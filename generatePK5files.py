@@ -10,7 +10,7 @@ from qgis.PyQt.QtWidgets import (
     QMessageBox,
     QInputDialog,
     QDialog, QVBoxLayout, QPushButton,
-    QCheckBox, QLabel, QLineEdit, QHBoxLayout
+    QCheckBox, QLabel, QLineEdit, QHBoxLayout, QComboBox
 )
 from qgis.core import (
     QgsProject, 
@@ -43,8 +43,14 @@ from PyQt5.QtWidgets import QSpinBox
 from PyQt5.QtGui import QIntValidator
 import os
 import platform
+import numpy as np
 from collections import defaultdict
 from . import tools
+from .meshData import loadMesh, WRITE_CHUNK
+from .meshConnectivity import buildBoundaryWalls
+from .meshAttributes import readAttribute
+from .binaryCaseFiles import BINARY_EXTENSION, writeFEDbinary, writeHOTSTARTbinary
+from .compressedFiles import COMPRESSION_METHODS, compressedPath, openCaseFile
 from .messages import (
     log_info,
     log_error,
@@ -100,6 +106,9 @@ class exportDialog(QDialog):
         self.Tdump = QLineEdit()
         self.Tout = QLineEdit()
         self.nIterInfo = QLineEdit()
+        self.checkbox_binary = QCheckBox("Binary FED/HOTSTART files (.bin)")
+        self.compression = QComboBox()
+        self.compression.addItems(COMPRESSION_METHODS)
 
         # ---- Load stored values ----
         self.load_settings()
@@ -145,6 +154,11 @@ class exportDialog(QDialog):
         row2.addWidget(self.nIterInfo)
         layout.addLayout(row2)
 
+        layout.addWidget(self.checkbox_binary)
+        row3 = QHBoxLayout()
+        row3.addWidget(QLabel("Compression (FED, HOTSTART, OBCP)"))
+        row3.addWidget(self.compression)
+        layout.addLayout(row3)
         layout.addWidget(btn_create1)
         layout.addWidget(btn_create2)
         layout.addWidget(btn_create3)
@@ -166,6 +180,9 @@ class exportDialog(QDialog):
         self.Tdump.setText(self.settings.value("Tdump", ""))
         self.Tout.setText(self.settings.value("Tout", ""))
         self.nIterInfo.setText(self.settings.value("nIterInfo", ""))
+        self.checkbox_binary.setChecked(self.settings.value("binary", False, type=bool))
+        compression = self.settings.value("compression", "None")
+        self.compression.setCurrentText(compression if compression in COMPRESSION_METHODS else "None")
 
         self.settings.endGroup()
 
@@ -179,6 +196,8 @@ class exportDialog(QDialog):
         self.settings.setValue("Tdump", self.Tdump.text())
         self.settings.setValue("Tout", self.Tout.text())
         self.settings.setValue("nIterInfo", self.nIterInfo.text())
+        self.settings.setValue("binary", self.checkbox_binary.isChecked())
+        self.settings.setValue("compression", self.compression.currentText())
 
         self.settings.endGroup()        
 
@@ -219,13 +238,15 @@ class exportDialog(QDialog):
         project_folder = os.path.dirname(project_path)
 
         msh_path = os.path.join(project_folder, "mesh.msh")
-        shp_path = os.path.join(project_folder, "mesh.shp")
+        shp_path = tools.meshLayerPath(project_folder)
 
         self.save_settings()
         case_name = self.case_name.text().strip()
         case_folder = os.path.join(project_folder, case_name)
         fed_path = os.path.join(case_folder, f"{case_name}.FED")
-        self.nodes, self.cells = createFEDfile(msh_path, shp_path, fed_path, self.mesh_type)
+        binary = self.checkbox_binary.isChecked()
+        compression = self.compression.currentText()
+        self.mesh = createFEDfile(msh_path, shp_path, fed_path, self.mesh_type, binary, compression)
 
 
     def on_export_hotstart_file(self):
@@ -233,13 +254,15 @@ class exportDialog(QDialog):
         project_path = QgsProject.instance().fileName()
         project_folder = os.path.dirname(project_path)
 
-        shp_path = os.path.join(project_folder, "mesh.shp")
+        shp_path = tools.meshLayerPath(project_folder)
 
         self.save_settings()
         case_name = self.case_name.text().strip()
         case_folder = os.path.join(project_folder, case_name)
         hotstart_path = os.path.join(case_folder, f"{case_name}.HOTSTART") 
-        createHOTSTARTfiles(shp_path, hotstart_path)
+        binary = self.checkbox_binary.isChecked()
+        compression = self.compression.currentText()
+        createHOTSTARTfiles(shp_path, hotstart_path, binary, compression)
 
 
     def on_export_obcp_file(self):
@@ -247,13 +270,14 @@ class exportDialog(QDialog):
         project_path = QgsProject.instance().fileName()
         project_folder = os.path.dirname(project_path)
 
-        shp_path = os.path.join(project_folder, "mesh.shp")
+        shp_path = tools.meshLayerPath(project_folder)
 
         self.save_settings()
         case_name = self.case_name.text()
         case_folder = os.path.join(project_folder, case_name) 
         obcp_path = os.path.join(case_folder, f"{case_name}.OBCP")   
-        createOBCPfiles(shp_path, obcp_path)        
+        compression = self.compression.currentText()
+        createOBCPfiles(shp_path, obcp_path, compression)
 
 
 def createDATfiles(self, dat_path):
@@ -324,110 +348,95 @@ def createCLEANfiles(system, clear_path):
         log_error(msg)
 
 
-def createFEDfile(msh_path, shp_path, fed_path, mesh_type):
-    nodes = {}      # id -> (x,y)
-    cells = []      # [[n1,n2,n3]] Triangle - [[n1,n2,n3,n4]] Quad
-
-    with open(msh_path, "r") as f:
-        lines = f.readlines()
-
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
-
-        # ---- NODES ----
-        if line == "$Nodes":
-            n_nodes = int(lines[i+1].strip())
-            i += 2
-
-            for _ in range(n_nodes):
-                parts = lines[i].split()
-                node_id = int(parts[0])
-                x = float(parts[1])
-                y = float(parts[2])
-                nodes[node_id] = (x, y)
-                i += 1
-
-        # ---- ELEMENTS ----
-        elif line == "$Elements":
-            n_elem = int(lines[i+1].strip())
-            i += 2
-
-            for _ in range(n_elem):
-                parts = lines[i].split()
-                elem_type = int(parts[1])
-                ntags = int(parts[2])
-
-                # Triangle
-                if mesh_type == "triangle" and elem_type == 2:
-                    n1 = int(parts[3 + ntags])
-                    n2 = int(parts[4 + ntags])
-                    n3 = int(parts[5 + ntags])
-                    cells.append([n1, n2, n3])
-
-                # Quad
-                elif mesh_type == "quad" and elem_type == 3:
-                    n1 = int(parts[3 + ntags])
-                    n2 = int(parts[4 + ntags])
-                    n3 = int(parts[5 + ntags])
-                    n4 = int(parts[6 + ntags])
-                    cells.append([n1, n2, n3, n4]) 
-
-                i += 1
-        else:
-            i += 1
-
-    nvertex = len(nodes)
+def createFEDfile(msh_path, shp_path, fed_path, mesh_type, binary=False, compression="None"):
+    mesh = loadMesh(msh_path)
+
+    # Triangle [[n1,n2,n3]] - Quad [[n1,n2,n3,n4]]
+    if mesh_type == "triangle":
+        cells = mesh.cellsOfType(2)
+    elif mesh_type == "quad":
+        cells = mesh.cellsOfType(3)
+
+    # Nodes ordered by id
+    order = np.argsort(mesh.node_tags, kind="stable")
+    node_ids = mesh.node_tags[order]
+    node_xy = mesh.nodes[order]
+
+    nvertex = mesh.nnodes
     ncells = len(cells)
     if mesh_type == "triangle":
         vertexXcell = 3
     elif mesh_type == "quad":
         vertexXcell = 4
 
-    # ---- READ TERRAIN FEATURES ----
-    field_name = "zbed"
-    zbed = readFieldDataFromLayer(shp_path, field_name)
-
-    field_name = "hini"
-    hini = readFieldDataFromLayer(shp_path, field_name)    
+    # ---- READ TERRAIN FEATURES (single pass) ----
+    fields = readFieldsFromLayer(shp_path, ["zbed", "hini", "nman"])
+    if fields["zbed"] is None:
+        msg = "Terrain elevation must be added to mesh before exporting .FED file"
+        log_error(msg)
+        return
+    if fields["nman"] is None:
+        msg = "Manning roughness must be added to mesh before exporting .FED file"
+        log_error(msg)
+        return
+
+    # Cell columns aligned with the cells (no initial depth: wsl = zbed)
+    zbed = np.asarray(fields["zbed"], dtype=np.float64)[:ncells]
+    nman = np.asarray(fields["nman"], dtype=np.float64)[:ncells]
+    wsl = zbed.copy()
+    if fields["hini"] is not None:
+        wsl += np.asarray(fields["hini"], dtype=np.float64)[:ncells]
+    cell_ids = np.arange(1, ncells + 1)
+
+    # ---- WRITE FED (binary) ----
+    if binary:
+        fed_path = compressedPath(fed_path + BINARY_EXTENSION, compression)
+        with openCaseFile(fed_path, "wb", compression) as f:
+            writeFEDbinary(f, node_ids, node_xy, cells, nman, zbed, wsl)
+
+        msg=f"Export binary .FED mesh file done: {os.path.basename(fed_path)}" 
+        log_info(msg)
+        return mesh
 
-    field_name = "nman"
-    nman = readFieldDataFromLayer(shp_path, field_name)
-    
     # ---- WRITE FED ----
-    with open(fed_path, "w") as f:
+    # Node and cell blocks are formatted in chunks of WRITE_CHUNK rows,
+    # streamed through the compressor if any
+    fed_path = compressedPath(fed_path, compression)
+    with openCaseFile(fed_path, "w", compression) as f:
         # Header
         f.write(f"{ncells} {nvertex} {vertexXcell} 0\n")
 
         # Nodes (ordenados por ID)
-        for node_id in sorted(nodes.keys()):
-            x, y = nodes[node_id]
-            f.write(
-                f"{node_id} {x:.6f} {y:.6f} 0.0 0.0 -9999 0 0\n"
-            )
+        fmt = "%d %.6f %.6f 0.0 0.0 -9999 0 0\n"
+        for a in range(0, nvertex, WRITE_CHUNK):
+            b = min(a + WRITE_CHUNK, nvertex)
+            rows = zip(node_ids[a:b].tolist(), *node_xy[a:b].T.tolist())
+            f.write("".join(map(fmt.__mod__, rows)))
 
         # Cells
-        for i, cell_nodes in enumerate(cells, start=1):
-            zb = zbed[i-1]
-            wsl = zbed[i-1] + hini[i-1]
-            nb = nman[i-1]
-            if mesh_type == "triangle":
-                n1, n2, n3 = cell_nodes
-                f.write(f"{i} {n1} {n2} {n3} {nb:.3f} {zb:.6f} {wsl:.6f} 0.0 0.0\n")
-            elif mesh_type == "quad":
-                n1, n2, n3, n4 = cell_nodes
-                f.write(f"{i} {n1} {n2} {n3} {n4} {nb:.3f} {zb:.6f} {wsl:.6f} 0.0 0.0\n")
+        fmt = "%d" + " %d" * vertexXcell + " %.3f %.6f %.6f 0.0 0.0\n"
+        for a in range(0, ncells, WRITE_CHUNK):
+            b = min(a + WRITE_CHUNK, ncells)
+            rows = zip(
+                cell_ids[a:b].tolist(), *cells[a:b].T.tolist(),
+                nman[a:b].tolist(), zbed[a:b].tolist(), wsl[a:b].tolist()
+            )
+            f.write("".join(map(fmt.__mod__, rows)))
 
     msg=f"Export .FED mesh file done." 
     log_info(msg)
 
-    return nodes, cells
+    return mesh
+
 
+# Hydrodynamic variables of the HOTSTART file, followed by the sediments phi1..N
+HOTSTART_VARIABLES = ["zbed", "hini", "uini", "vini"]
 
-def createHOTSTARTfiles(shp_path, hotstart_path):
+
+def createHOTSTARTfiles(shp_path, hotstart_path, binary=False, compression="None"):
 
     #number of hydrodynamic variables
-    nhydro = 4 
+    nhydro = len(HOTSTART_VARIABLES)
 
     #number of sediments
     settings = QSettings()
@@ -435,100 +444,64 @@ def createHOTSTARTfiles(shp_path, hotstart_path):
     n_sediments = settings.value("n_sediments", 1, type=int)
     settings.endGroup()
 
-    #Read available hydrodynamic variables
-    layer = QgsVectorLayer(shp_path, "mesh_tmp", "ogr")
-
-    field_name = "zbed"
-    if layer.fields().indexOf(field_name) != -1:
-        zbed = readFieldDataFromLayer(shp_path, field_name)
-    else:
+    #Read available variables (attribute store or mesh layer, single pass)
+    names = HOTSTART_VARIABLES + [f"phi{i+1}" for i in range(n_sediments)]
+    fields = readFieldsFromLayer(shp_path, names)
+    if fields["zbed"] is None:
         msg = "Terrain elevation must be added to mesh before exporting .HOTSTART file"
         log_error(msg)
+        return
 
-    field_name = "hini"
-    if layer.fields().indexOf(field_name) != -1:
-        hini = readFieldDataFromLayer(shp_path, field_name)
-    else:
-        hini = None    
+    data, present = hotstartColumns(fields, names)
+    ncells = data.shape[0]
 
-    field_name = "uini"
-    if layer.fields().indexOf(field_name) != -1:
-        uini = readFieldDataFromLayer(shp_path, field_name)
-    else:
-        uini = None    
+    # ---- WRITE HOTSTART (binary) ----
+    if binary:
+        hotstart_path = compressedPath(hotstart_path + BINARY_EXTENSION, compression)
+        with openCaseFile(hotstart_path, "wb", compression) as f:
+            writeHOTSTARTbinary(f, nhydro, n_sediments, data)
 
-    field_name = "vini"
-    if layer.fields().indexOf(field_name) != -1:
-        vini = readFieldDataFromLayer(shp_path, field_name)
-    else:
-        vini = None 
-
-    if n_sediments > 0:
-        for i in range(n_sediments):
-            field_name = f"phi{i+1}"
-            if layer.fields().indexOf(field_name) != -1:
-                data = readFieldDataFromLayer(shp_path, field_name)
-            else:
-                data = None
-            # Crear variable phi1, phi2, ...
-            globals()[f"phi{i+1}"] = data           
-
-    
-
-    # ---- WRITE FED ----
-    with open(hotstart_path, "w") as f:
+        msg=f"Export binary .HOTSTART mesh file done: {os.path.basename(hotstart_path)}" 
+        log_info(msg)
+        return
+
+    # ---- WRITE HOTSTART ----
+    # Absent variables are written as 0.0, present ones with 6 decimals
+    fmt = "".join("%.6f " if p else "0.0 " for p in present) + "\n"
+    data = data[:, present]
+    hotstart_path = compressedPath(hotstart_path, compression)
+    with openCaseFile(hotstart_path, "w", compression) as f:
         # Header
         f.write(f"{nhydro} {n_sediments} 0 0\n")
 
         # Cells
-        for i in range( len(zbed) ): #zbed always exists
-            #zbed
-            var = zbed
-            value = var[i]
-            f.write(f"{value:.6f} ")
-
-            #hini
-            var = hini
-            if var is not None:
-                value = var[i]
-                f.write(f"{value:.6f} ")
-            else:
-                f.write("0.0 ")
-
-            #uini
-            var = uini
-            if var is not None:
-                value = var[i]
-                f.write(f"{value:.6f} ")
-            else:
-                f.write("0.0 ")
-
-            #vini
-            var = vini
-            if var is not None:
-                value = var[i]
-                f.write(f"{value:.6f} ")
-            else:
-                f.write("0.0 ")
-
-            #n_sediments phi
-            if n_sediments > 0:
-                for i in range(n_sediments):
-                    var = globals().get(f"phi{i+1}", None)
-                    if var is not None:
-                        value = var[i]
-                        f.write(f"{value:.6f} ")
-                    else:
-                        f.write("0.0 ")
-            
-            #EOL
-            f.write("\n")
+        for a in range(0, ncells, WRITE_CHUNK):
+            b = min(a + WRITE_CHUNK, ncells)
+            rows = map(tuple, data[a:b].tolist())
+            f.write("".join(map(fmt.__mod__, rows)))
 
     msg=f"Export .HOTSTART mesh file done." 
     log_info(msg)
 
 
-def createOBCPfiles(shp_path, obcp_path):
+def hotstartColumns(fields, names):
+    """
+    HOTSTART cell data as a (ncells, nvars) float array in the given variable
+    order (zeros where a variable is absent) and the mask of present variables.
+    zbed must be present and sets the number of cells.
+    """
+    ncells = len(fields["zbed"])
+    data = np.zeros((ncells, len(names)), dtype=np.float64)
+    present = np.zeros(len(names), dtype=bool)
+    for k, name in enumerate(names):
+        if fields[name] is not None:
+            data[:, k] = fields[name][:ncells]
+            present[k] = True
+
+    return data, present
+
+
+def createOBCPfiles(shp_path, obcp_path, compression="None"):
     # OUTLETS -----------------------------------------------------------
     noutlets = 0
     olayer = None
@@ -567,14 +540,22 @@ def createOBCPfiles(shp_path, obcp_path):
         msg=f"Layer {shp_path} not found."
         log_error(msg)
 
-    #Domain boundary nodes
-    nodes = globalNodesCoordinates(mesh_layer)
-    nodes_on_boundary = globalBoundaryNodes(mesh_layer)
-    msg=f"Number of boundary nodes in mesh: {len(nodes_on_boundary)}"
+    #Domain boundary walls and nodes, computed once from the mesh topology
+    msh_path = os.path.join(os.path.dirname(shp_path), "mesh.msh")
+    if os.path.exists(msh_path):
+        topology = boundaryTopology(msh_path)
+        nboundary = len(topology[1])
+    else:
+        topology = None
+        nodes = globalNodesCoordinates(mesh_layer)
+        nodes_on_boundary = globalBoundaryNodes(mesh_layer)
+        nboundary = len(nodes_on_boundary)
+    msg=f"Number of boundary nodes in mesh: {nboundary}"
     log_info(msg)
 
     # Create OBCP file
-    with open(obcp_path, "w") as f:
+    obcp_path = compressedPath(obcp_path, compression)
+    with openCaseFile(obcp_path, "w", compression) as f:
         f.write("202407\n")                 # version
         f.write(f"{noutlets+ninlets}\n")    # nobc
 
@@ -591,7 +572,10 @@ def createOBCPfiles(shp_path, obcp_path):
                 file = bound["File"]
                 f.write(f"{file}\n")
 
-                bound_nodes = getBoundaryNodes(mesh_layer, nodes, nodes_on_boundary, bound)
+                if topology is not None:
+                    bound_nodes = getBoundaryNodesFromTopology(topology, bound)
+                else:
+                    bound_nodes = getBoundaryNodes(mesh_layer, nodes, nodes_on_boundary, bound)
                 nobcnodes = len(bound_nodes)
                 f.write(f"{nobcnodes}\n")
                 for nid in bound_nodes:
@@ -610,7 +594,10 @@ def createOBCPfiles(shp_path, obcp_path):
                 file = bound["File"]
                 f.write(f"{file}\n")
 
-                bound_nodes = getBoundaryNodes(mesh_layer, nodes, nodes_on_boundary, bound)
+                if topology is not None:
+                    bound_nodes = getBoundaryNodesFromTopology(topology, bound)
+                else:
+                    bound_nodes = getBoundaryNodes(mesh_layer, nodes, nodes_on_boundary, bound)
                 nobcnodes = len(bound_nodes)
                 f.write(f"{nobcnodes}\n")
                 for nid in bound_nodes:
@@ -621,15 +608,46 @@ def createOBCPfiles(shp_path, obcp_path):
 
 
 def readFieldDataFromLayer(shp_path, field_name):
+    return readFieldsFromLayer(shp_path, [field_name])[field_name]
+
+
+def readFieldsFromLayer(shp_path, field_names):
+    """
+    Read several cell fields at once as float64 arrays {name: array}.
+    Fields in the columnar attribute store are memory-mapped; the rest are
+    read from the mesh layer in a single pass without geometries.
+    Fields not found anywhere are returned as None.
+    """
+    data = {name: readAttribute(os.path.dirname(shp_path), name) for name in field_names}
+    missing = [name for name in field_names if data[name] is None]
+    if not missing:
+        return data
+
     layer = QgsVectorLayer(shp_path, "mesh_tmp", "ogr")
-    if not layer:
+    if not layer.isValid():
         msg=f"Layer {shp_path} not found."
         log_error(msg)
+        return data
 
-    data = []
-    for feat in layer.getFeatures():
-        value = float(feat[field_name])  
-        data.append(value)      
+    fields = layer.fields()
+    missing = [name for name in missing if fields.indexOf(name) != -1]
+    if not missing:
+        return data
+
+    request = QgsFeatureRequest()
+    request.setFlags(QgsFeatureRequest.NoGeometry)
+    request.setSubsetOfAttributes(missing, fields)
+
+    columns = {name: [] for name in missing}
+    for feat in layer.getFeatures(request):
+        for name in missing:
+            try:
+                columns[name].append(float(feat[name]))
+            except (TypeError, ValueError):
+                columns[name].append(0.0)
+
+    for name in missing:
+        data[name] = np.asarray(columns[name], dtype=np.float64)
 
     return data
 
@@ -684,6 +702,35 @@ def globalBoundaryNodes(mesh_layer):
     return nodes_on_boundary
 
 
+def boundaryTopology(msh_path):
+    """
+    Boundary walls of the mesh (walls with a single cell) as node id pairs,
+    the boundary node ids and their XY coordinates.
+    """
+    mesh = loadMesh(msh_path)
+    edges, _, _ = buildBoundaryWalls(mesh.cells)
+    boundary_nodes = np.unique(edges)
+    xy = mesh.nodes[mesh.nodeIndex(boundary_nodes)]
+
+    return edges, boundary_nodes, xy
+
+
+def getBoundaryNodesFromTopology(topology, bound):
+    edges, boundary_nodes, xy = topology
+
+    #Boundary nodes inside the bound polygon (vectorized test)
+    inside = boundary_nodes[tools.pointsInGeometry(bound.geometry(), xy)]
+    #Boundary walls fully included in the bound
+    mask = np.isin(edges[:, 0], inside) & np.isin(edges[:, 1], inside)
+    filtered_edges = [tuple(e) for e in edges[mask].tolist()]
+    if not filtered_edges:
+        return []
+    #Get ordered nodes
+    ordered_nodes = orderBoundaryNodes(filtered_edges)
+
+    return ordered_nodes
+
+
 def getBoundaryNodes(mesh_layer, nodes, global_boundary_nodes, bound):
     #Found cells in boundary polygon
     cells = cellsInBoundaryPolygon(mesh_layer, bound)
@@ -41,6 +41,9 @@ from PyQt5.QtWidgets import QSpinBox
 from PyQt5.QtGui import QIntValidator
 import os
 from . import tools
+from .rasterSampling import (
+    sampleMeshFromRasters
+)
 from .messages import (
     log_info,
     log_error,
@@ -409,7 +412,7 @@ def addFlowScalarToMesh(layer_name,field_name):
     project_folder = os.path.dirname(project_path)
 
     # Mesh layer
-    mesh_path = os.path.join(project_folder, "mesh.shp")
+    mesh_path = tools.meshLayerPath(project_folder)
     mesh = QgsVectorLayer(mesh_path, "mesh", "ogr")
     if not mesh.isValid():
         log_error("Domain mesh not found or invalid")
@@ -418,33 +421,15 @@ def addFlowScalarToMesh(layer_name,field_name):
     # Source layer
     source_path = os.path.join(project_folder, f"{layer_name}.shp")
     source = QgsVectorLayer(source_path, layer_name, "ogr")
-    source_polygons = list(source.getFeatures())  # orden de la capa
 
     # New mesh field
-    if field_name not in [f.name() for f in mesh.fields()]:
-        mesh.startEditing()
-        mesh.addAttribute(QgsField(field_name, QVariant.Double))
-        mesh.updateFields()
-        mesh.commitChanges()
-
-    # Sample new mesh values
-    mesh.startEditing()
-    for feat in mesh.getFeatures():
-        centroid = feat.geometry().centroid()
-
-        val = None
-        for pol in source_polygons:
-            if pol.geometry().contains(centroid):
-                val = pol[field_name]
-
-        if val is not None:
-            feat[field_name] = val
-        else:
-            feat[field_name] = 0.0
-        
-        mesh.updateFeature(feat)
+    tools.addMeshFields(mesh, [field_name])
 
-    mesh.commitChanges()
+    # Sample new mesh values (last polygon in layer order wins)
+    fids, columns = tools.polygonOverlay(mesh, source, [field_name])
+
+    # Write all the values at once
+    tools.writeMeshFields(mesh, fids, columns)
 
     msg=f"Flow variable {field_name} added to mesh layer"
     log_info(msg)
@@ -457,7 +442,7 @@ def addFlowVectorToMesh(layer_name,field1_name,field2_name):
     project_folder = os.path.dirname(project_path)
 
     # Mesh layer
-    mesh_path = os.path.join(project_folder, "mesh.shp")
+    mesh_path = tools.meshLayerPath(project_folder)
     mesh = QgsVectorLayer(mesh_path, "mesh", "ogr")
     if not mesh.isValid():
         log_error("Domain mesh not found or invalid")
@@ -466,46 +451,15 @@ def addFlowVectorToMesh(layer_name,field1_name,field2_name):
     # Source layer
     source_path = os.path.join(project_folder, f"{layer_name}.shp")
     source = QgsVectorLayer(source_path, layer_name, "ogr")
-    source_polygons = list(source.getFeatures())  # orden de la capa
 
     # New mesh field
-    if field1_name not in [f.name() for f in mesh.fields()]:
-        mesh.startEditing()
-        mesh.addAttribute(QgsField(field1_name, QVariant.Double))
-        mesh.updateFields()
-        mesh.commitChanges()
-
-    if field2_name not in [f.name() for f in mesh.fields()]:
-        mesh.startEditing()
-        mesh.addAttribute(QgsField(field2_name, QVariant.Double))
-        mesh.updateFields()
-        mesh.commitChanges()        
-
-    # Sample new mesh values
-    mesh.startEditing()
-    for feat in mesh.getFeatures():
-        centroid = feat.geometry().centroid()
-
-        val1 = None
-        val2 = None
-        for pol in source_polygons:
-            if pol.geometry().contains(centroid):
-                val1 = pol[field1_name]
-                val2 = pol[field2_name]
-
-        if val1 is not None:
-            feat[field1_name] = val1
-        else:
-            feat[field1_name] = 0.0
+    tools.addMeshFields(mesh, [field1_name, field2_name])        
 
-        if val2 is not None:
-            feat[field2_name] = val2
-        else:
-            feat[field2_name] = 0.0            
-        
-        mesh.updateFeature(feat)
+    # Sample new mesh values (last polygon in layer order wins)
+    fids, columns = tools.polygonOverlay(mesh, source, [field1_name, field2_name])
 
-    mesh.commitChanges()
+    # Write all the values at once
+    tools.writeMeshFields(mesh, fids, columns)
 
     msg=f"Flow vector ({field1_name,field2_name}) added to mesh layer"
     log_info(msg)
@@ -518,7 +472,7 @@ def addMultiScalarToMesh(layer_name,field_prefix,nvar):
     project_folder = os.path.dirname(project_path)
 
     # Mesh layer
-    mesh_path = os.path.join(project_folder, "mesh.shp")
+    mesh_path = tools.meshLayerPath(project_folder)
     mesh = QgsVectorLayer(mesh_path, "mesh", "ogr")
     if not mesh.isValid():
         log_error("Domain mesh not found or invalid")
@@ -527,137 +481,71 @@ def addMultiScalarToMesh(layer_name,field_prefix,nvar):
     # Source layer
     source_path = os.path.join(project_folder, f"{layer_name}.shp")
     source = QgsVectorLayer(source_path, layer_name, "ogr")
-    source_polygons = list(source.getFeatures())  # orden de la capa
 
     # --- Generate field names: sed1, sed2, ...
     field_names = [f"{field_prefix}{i+1}" for i in range(nvar)]
 
     # --- Add fields if not present
-    mesh.startEditing()
-    existing_fields = [f.name() for f in mesh.fields()]
-    for fname in field_names:
-        if fname not in existing_fields:
-            mesh.addAttribute(QgsField(fname, QVariant.Double))
-    mesh.updateFields()
-    mesh.commitChanges()
-
-
-    # Sample new mesh values
-    mesh.startEditing()
-    for feat in mesh.getFeatures():
-        centroid = feat.geometry().centroid()
-
-        values = {fname: 0.0 for fname in field_names}
+    tools.addMeshFields(mesh, field_names)
 
-        for pol in source_polygons:
-            if pol.geometry().contains(centroid):
-                for fname in field_names:
-                    values[fname] = pol[fname]
-                break
 
-        for fname in field_names:
-            feat[fname] = values[fname]
+    # Sample new mesh values (last polygon in layer order wins)
+    fids, columns = tools.polygonOverlay(mesh, source, field_names)
 
-        mesh.updateFeature(feat)
-
-    mesh.commitChanges()
+    # Write all the values at once
+    tools.writeMeshFields(mesh, fids, columns)
 
     msg=f"Sediment concentration {field_prefix}{nvar}-component added to mesh layer"
     log_info(msg)
 
 
-def addFlowScalarToMeshFromRaster(raster,field_name):
+def addFlowScalarToMeshFromRaster(raster,field_name,method="Nearest"):
 
     # Project folder
     project_path = QgsProject.instance().fileName()
     project_folder = os.path.dirname(project_path)
 
     # Mesh layer
-    mesh_path = os.path.join(project_folder, "mesh.shp")
+    mesh_path = tools.meshLayerPath(project_folder)
     mesh = QgsVectorLayer(mesh_path, "mesh", "ogr")
     if not mesh.isValid():
         log_error("Domain mesh not found or invalid")
         return
     
-    # Get raster layer data
-    provider = raster.dataProvider()
-
     # New mesh field
-    if field_name not in [f.name() for f in mesh.fields()]:
-        mesh.startEditing()
-        mesh.addAttribute(QgsField(field_name, QVariant.Double))
-        mesh.updateFields()
-        mesh.commitChanges()
-
-    # Sample new mesh values
-    mesh.startEditing()
-    for feat in mesh.getFeatures():
-        pt = feat.geometry().centroid().asPoint()
-        result = provider.sample(pt, 1)
-
-        if result[1]:  # ok
-            feat[field_name] = result[0]
-        else:
-            feat[field_name] = 0.0
-        
-        mesh.updateFeature(feat)
+    tools.addMeshFields(mesh, [field_name])
+
+    # Sample new mesh values (centroid or zonal), reading the raster by tiles
+    fids, (values,) = sampleMeshFromRasters(mesh, [raster], method)
 
-    mesh.commitChanges()
+    # Write all the values at once
+    tools.writeMeshFields(mesh, fids, {field_name: values.tolist()})
 
     msg=f"Flow variable {field_name} sampled to mesh layer from raster"
     log_info(msg)
 
 
-def addFlowVectorToMeshFromRaster(rasterX,rasterY,field1_name,field2_name):
+def addFlowVectorToMeshFromRaster(rasterX,rasterY,field1_name,field2_name,method="Nearest"):
 
     # Project folder
     project_path = QgsProject.instance().fileName()
     project_folder = os.path.dirname(project_path)
 
     # Mesh layer
-    mesh_path = os.path.join(project_folder, "mesh.shp")
+    mesh_path = tools.meshLayerPath(project_folder)
     mesh = QgsVectorLayer(mesh_path, "mesh", "ogr")
     if not mesh.isValid():
         log_error("Domain mesh not found or invalid")
         return
     
-    # Get raster layer data
-    providerX = rasterX.dataProvider()
-    providerY = rasterY.dataProvider()
-
     # New mesh field
-    if field1_name not in [f.name() for f in mesh.fields()]:
-        mesh.startEditing()
-        mesh.addAttribute(QgsField(field1_name, QVariant.Double))
-        mesh.updateFields()
-        mesh.commitChanges()
-
-    if field2_name not in [f.name() for f in mesh.fields()]:
-        mesh.startEditing()
-        mesh.addAttribute(QgsField(field2_name, QVariant.Double))
-        mesh.updateFields()
-        mesh.commitChanges()
-
-    # Sample new mesh values
-    mesh.startEditing()
-    for feat in mesh.getFeatures():
-        pt = feat.geometry().centroid().asPoint()
-        result1 = providerX.sample(pt, 1)
-        result2 = providerY.sample(pt, 1)
-
-        if result1[1]:  # ok
-            feat[field1_name] = result1[0]
-        else:
-            feat[field1_name] = 0.0
+    tools.addMeshFields(mesh, [field1_name, field2_name])
 
-        if result2[1]:  # ok
-            feat[field2_name] = result2[0]
-        else:
-            feat[field2_name] = 0.0            
-        
-        mesh.updateFeature(feat)
+    # Sample new mesh values (centroid or zonal), reading the rasters by tiles
+    fids, (values1, values2) = sampleMeshFromRasters(mesh, [rasterX, rasterY], method)
 
-    mesh.commitChanges()
+    # Write all the values at once
+    tools.writeMeshFields(mesh, fids, {field1_name: values1.tolist(), field2_name: values2.tolist()})
 
     msg=f"Flow vector ({field1_name,field2_name}) added to mesh layer from raster"
     log_info(msg)
@@ -669,7 +557,7 @@ def reloadAndStyleMesh(var,iface):
     #tools.remove_layer_by_name("mesh_v2")
 
     project_folder = os.path.dirname(QgsProject.instance().fileName())
-    mesh_path = os.path.join(project_folder, "mesh.shp")
+    mesh_path = tools.meshLayerPath(project_folder)
     mesh = QgsVectorLayer(mesh_path, "mesh", "ogr")
     if not mesh.isValid():
         log_error("Domain mesh not found or invalid")
@@ -0,0 +1,116 @@
+######################## PeKa2D-v5 Graphical User Interface (GUI) #########################
+
+# PeKa2D-v5 GUI plugin for QGIS 3
+# © 2025 Sergio Martínez-Aranda. License CC BY-NC-SA 4.0
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+
+###########################################################################################
+
+import os
+import numpy as np
+from .meshData import loadMesh
+from .messages import (
+    log_info,
+    log_error,
+    log_warning
+)
+
+# Columnar store of cell attributes: one float64 .npy per field, indexed by
+# the mesh layer cell position (idx). It is the source of truth for cell data;
+# the mesh layer fields are only a view used for styling.
+ATTRIBUTES_DIR = "mesh_attributes"
+
+# Key of the mesh.msh the stored attributes belong to
+ATTRIBUTES_KEY = "msh_key.npy"
+
+
+def _mshKey(msh_path):
+    st = os.stat(msh_path)
+    return np.array([st.st_mtime_ns, st.st_size], dtype=np.int64)
+
+
+def _floatColumn(column, default):
+    """Column as float64, with missing (None/NULL) values set to default"""
+    try:
+        values = np.array(column, dtype=np.float64)
+    except (TypeError, ValueError):
+        values = []
+        for value in column:
+            try:
+                values.append(float(value))
+            except (TypeError, ValueError):
+                values.append(default)
+        values = np.asarray(values, dtype=np.float64)
+
+    values[np.isnan(values)] = default
+    return values
+
+
+def attributeStore(project_folder):
+    """
+    Path of the attribute store of the project mesh. Attributes stored for a
+    previous mesh.msh (regenerated or reordered mesh) are discarded.
+    Returns None if the project has no mesh.msh.
+    """
+    msh_path = os.path.join(project_folder, "mesh.msh")
+    if not os.path.exists(msh_path):
+        return None
+
+    store = os.path.join(project_folder, ATTRIBUTES_DIR)
+    key_path = os.path.join(store, ATTRIBUTES_KEY)
+    key = _mshKey(msh_path)
+
+    if os.path.exists(key_path) and np.array_equal(np.load(key_path), key):
+        return store
+
+    os.makedirs(store, exist_ok=True)
+    for name in os.listdir(store):
+        if name.endswith(".npy"):
+            os.remove(os.path.join(store, name))
+    np.save(key_path, key)
+
+    return store
+
+
+def readAttribute(project_folder, name):
+    """Memory-mapped values of a cell attribute, or None if it is not stored"""
+    store = attributeStore(project_folder)
+    if store is None:
+        return None
+    path = os.path.join(store, f"{name}.npy")
+    if not os.path.exists(path):
+        return None
+    return np.load(path, mmap_mode="r")
+
+
+def writeAttributes(project_folder, cells, values, default=0.0):
+    """
+    Store cell attributes. values is a dict {name: sequence aligned with
+    cells}, the cell positions (mesh layer idx) being written. Cells not
+    written keep their stored value, or the default for new attributes.
+    Returns False if the project has no mesh to key the store to.
+    """
+    store = attributeStore(project_folder)
+    if store is None:
+        msg=f"Mesh attribute store not available: mesh.msh not found"
+        log_warning(msg)
+        return False
+
+    ncells = loadMesh(os.path.join(project_folder, "mesh.msh")).ncells
+    cells = np.asarray(cells, dtype=np.int64)
+    if len(cells) and (cells.min() < 0 or cells.max() >= ncells):
+        msg=f"Mesh attribute store not updated: cell index out of the {ncells} mesh cells"
+        log_warning(msg)
+        return False
+
+    for name, column in values.items():
+        path = os.path.join(store, f"{name}.npy")
+        if os.path.exists(path):
+            data = np.load(path)
+        else:
+            data = np.full(ncells, default, dtype=np.float64)
+
+        data[cells] = _floatColumn(column, default)
+        np.save(path, data)
+
+    return True
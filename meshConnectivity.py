@@ -10,19 +10,33 @@ from qgis.PyQt.QtWidgets import (
     QMessageBox,
     QInputDialog,
     QDialog, QVBoxLayout, QPushButton,
-    QCheckBox, QLabel
+    QCheckBox, QLabel, QComboBox, QSpinBox, QHBoxLayout
 )
 from qgis.core import QgsProject, QgsVectorLayer
 import os
 import sys
 import subprocess
 import numpy as np
+from scipy import sparse
 import matplotlib.pyplot as plt
-import matplotlib.cm as cm
+import matplotlib.colors as colors
 import math
-from collections import defaultdict
 from .meshElements import generateMeshLayer
-from .reorderMatrixMethods import applyRCMreordering
+from .meshData import loadMesh, storeMesh, writeMshFile
+from .reorderMatrixMethods import (
+    REORDER_STRATEGIES,
+    NODE_REORDER_STRATEGIES,
+    applyReordering,
+    applyNodeReordering,
+    reorderRCMneighbors,
+    renumberNeighborNodes,
+    buildCellConnectivityFromNeighbors
+)
+from .meshMetrics import (
+    computeOrderingMetrics,
+    logOrderingMetrics,
+    writeOrderingMetrics
+)
 from . import tools
 from .messages import (
     log_info,
@@ -43,8 +57,7 @@ class orderingDialog(QDialog):
         self.setWindowTitle("Mesh connectivity")
         self.iface = iface
 
-        self.nodes = None
-        self.elements = None
+        self.mesh = None
         self.neighbors = None
 
         layout = QVBoxLayout(self)
@@ -54,6 +67,32 @@ class orderingDialog(QDialog):
         btn1.clicked.connect(self.on_get_mesh_connectivity)
         layout.addWidget(btn1)
 
+        # Reordering strategy
+        row = QHBoxLayout()
+        row.addWidget(QLabel("Reordering"))
+        self.strategy = QComboBox()
+        self.strategy.addItems(list(REORDER_STRATEGIES.keys()))
+        row.addWidget(self.strategy)
+        row.addWidget(QLabel("Partitions"))
+        self.nparts = QSpinBox()
+        self.nparts.setMinimum(1)
+        self.nparts.setMaximum(1024)
+        self.nparts.setValue(8)
+        row.addWidget(self.nparts)
+        layout.addLayout(row)
+
+        # Node renumbering
+        row = QHBoxLayout()
+        row.addWidget(QLabel("Node renumbering"))
+        self.node_strategy = QComboBox()
+        self.node_strategy.addItems(list(NODE_REORDER_STRATEGIES.keys()))
+        row.addWidget(self.node_strategy)
+        layout.addLayout(row)
+
+        # Output format of the reordered mesh
+        self.checkbox_binary = QCheckBox("Write reordered MSH in binary format")
+        layout.addWidget(self.checkbox_binary)
+
         # Optimize mesh connectivity
         btn2 = QPushButton("Optimize mesh connectivity")
         btn2.clicked.connect(self.on_optimize_mesh_connectivity)
@@ -67,17 +106,21 @@ class orderingDialog(QDialog):
 
     # Get connectivity actions
     def on_get_mesh_connectivity(self):
-        self.nodes, self.elements, self.neighbors = getMeshConnectivity()
+        self.mesh, self.neighbors = getMeshConnectivity()
         reloadAndStyleMesh("idx",self.iface)
 
     # Optimize connectivity actions
     def on_optimize_mesh_connectivity(self):
-        self.elements, self.neighbors = optimizeMeshConnectivity(self.nodes,self.elements,self.neighbors)
+        strategy = self.strategy.currentText()
+        nparts = self.nparts.value()
+        node_strategy = self.node_strategy.currentText()
+        binary = self.checkbox_binary.isChecked()
+        self.mesh, self.neighbors = optimizeMeshConnectivity(self.mesh,self.neighbors,strategy,nparts,node_strategy,binary)
         reloadAndStyleMesh("idx",self.iface)
 
     # Plot connectivity actions
     def on_plot_mesh_connectivity(self):
-        plotMeshConnectivity(self.elements,self.neighbors)
+        plotMeshConnectivity(self.mesh,self.neighbors)
 
 
 def getMeshConnectivity():
@@ -93,25 +136,23 @@ def getMeshConnectivity():
 
     # Read de msh file
     filename = os.path.join(project_folder, "mesh.msh")
-    elements,nodes = readGmshFile(filename)
-    msg=f"Mesh MSH file read"   
-    log_info(msg)
-    msg=f"Number of nodes: {len(nodes)}"   
+    mesh = readGmshFile(filename)
+    msg=f"Number of nodes: {mesh.nnodes}"   
     log_info(msg)       
-    msg=f"Number of volume elements: {len(elements)}"   
+    msg=f"Number of volume elements: {mesh.ncells}"   
     log_info(msg)      
 
     # Create calclulus wall list
-    neighbors = buildNeighbornCells(elements)
+    neighbors = buildNeighbornCells(mesh.cells)
     msg=f"Neighbor cells list created: {len(neighbors)} pairs"  
     log_info(msg)     
 
     #QMessageBox.information(None, "ORDERING", "Mesh connectivity computed\n")  
 
-    return nodes, elements, neighbors
+    return mesh, neighbors
 
 
-def optimizeMeshConnectivity(nodes,elements,neighbors):
+def optimizeMeshConnectivity(mesh,neighbors,strategy="RCM",nparts=8,node_strategy="None",binary=False):
     # Obtener carpeta del proyecto
     project_path = QgsProject.instance().fileName()
     project_folder = os.path.dirname(project_path)
@@ -119,42 +160,62 @@ def optimizeMeshConnectivity(nodes,elements,neighbors):
     # Tomar CRS del proyecto
     project_crs = QgsProject.instance().crs() 
 
-    # Apply RCM for mesh reordering
-    newElements = applyRCMreordering(elements,neighbors)
-    msg=f"RCM reordering applied"   
+    before = computeOrderingMetrics(mesh, neighbors)
+    logOrderingMetrics(before, f"Before {strategy}")
+
+    # Apply cell reordering
+    newMesh, perm = applyReordering(mesh, neighbors, strategy, nparts)
+    msg=f"{strategy} reordering applied"   
     log_info(msg) 
 
-    newNeighbors = buildNeighbornCells(newElements)
+    # Permute calculus walls instead of rebuilding them
+    inv_perm = np.empty_like(perm)
+    inv_perm[perm] = np.arange(len(perm))
+    newNeighbors = reorderRCMneighbors(neighbors, inv_perm)
+
+    # Optional node renumbering following the new cell order
+    cellMesh = newMesh
+    newMesh, node_perm = applyNodeReordering(cellMesh, node_strategy)
+    if node_perm is not None:
+        newNeighbors = renumberNeighborNodes(newNeighbors, cellMesh, node_perm)
+        msg=f"{node_strategy} node renumbering applied"
+        log_info(msg)
+
     msg=f"Reordered calculus walls created: {len(newNeighbors)} walls"  
     log_info(msg)         
 
+    after = computeOrderingMetrics(newMesh, newNeighbors)
+    logOrderingMetrics(after, f"After {strategy}")
+    writeOrderingMetrics(os.path.join(project_folder, "orderingMetrics.json"), strategy, before, after)
+
     # Write msh file
     msh_path = os.path.join(project_folder, "mesh.msh")
-    writeMeshReordered(msh_path, nodes, newElements)
+    writeMeshReordered(msh_path, newMesh, binary)
+    storeMesh(msh_path, newMesh)
     msg=f"Reordered MSH file written"  
     log_info(msg)  
 
-    # Generate mesh shp layer
-    #tools.remove_layer_by_name("mesh")
-    shp_path = os.path.join(project_folder, "mesh.shp")
-    generateMeshLayer(project_crs,msh_path,shp_path)
+    # Generate mesh layer
+    layer_path = tools.meshLayerPath(project_folder, existing=False)
+    generateMeshLayer(project_crs,msh_path,layer_path)
     msg=f"Ordered mesh layer generated"   
     log_info(msg)      
 
     #QMessageBox.information(None, "ORDERING", "Mesh reordering successful\n") 
 
-    return newElements, newNeighbors
+    return newMesh, newNeighbors
 
 
-def plotMeshConnectivity(elements,neighbors):
+def plotMeshConnectivity(mesh,neighbors):
     # Obtener carpeta del proyecto
     project_path = QgsProject.instance().fileName()
     project_folder = os.path.dirname(project_path)    
 
     # Compute conectivity matrix
-    Cmatrix = computeConnectivityMatrix(elements)
+    Cmatrix = computeConnectivityMatrix(neighbors, mesh.ncells)
     msg=f"Connectivity matrix created"   
     log_info(msg)
+    logOrderingMetrics(computeOrderingMetrics(mesh, neighbors), "Current ordering")
     
     # Show cell conectivity matrix      
     cell_png = os.path.join(project_folder, "cellConnectivity.png")
@@ -175,174 +236,118 @@ def plotMeshConnectivity(elements,neighbors):
 
 def readGmshFile(filename):
     """
-    Reads a GMSH .msh file (version 2 ASCII) and returns a list of nodes and elements.
+    Reads a GMSH .msh file (version 2 ASCII) and returns the array-backed mesh.
     Only considers 2D elements (triangles and quads).
+    The mesh is shared with the other plugin steps through the mesh cache.
     """
-    elements = []
-    nodes = []
+    return loadMesh(filename)
 
-    with open(filename, 'r', encoding='latin1') as f:
-        lines = f.readlines()
-    
-    reading_nodes = False
-    reading_elements = False
-    skip_next = False
-
-    for line in lines:
-        line = line.strip()
-
-        # --------------------
-        # NODES
-        # --------------------
-        if line == "$Nodes":
-            reading_nodes = True
-            skip_next = True  # number of nodes
-            continue
-
-        if line == "$EndNodes":
-            reading_nodes = False
-            continue
-
-        if reading_nodes:
-            if skip_next:
-                skip_next = False
-                continue
-
-            parts = line.split()
-            if len(parts) >= 4:
-                x = float(parts[1])
-                y = float(parts[2])
-                nodes.append((x, y))
-            continue
-
-        # --------------------
-        # ELEMENTS
-        # --------------------        
-        if line == "$Elements":
-            reading_elements = True
-            skip_next = True  # next line is the number of elements
-            continue
-
-        if line == "$EndElements":
-            break
-
-        if reading_elements:
-            if skip_next:
-                skip_next = False
-                continue  # skip number of elements line
-
-            parts = line.split()
-            if len(parts) < 4:
-                continue
-
-            elem_type = int(parts[1])
-            num_tags = int(parts[2])
-            node_start = 3 + num_tags
-            cell_node = list(map(int, parts[node_start:]))
-
-            # 2D elements only
-            if elem_type == 2 and len(cell_node) == 3:      # triangle
-                elements.append(cell_node)
-            elif elem_type == 3 and len(cell_node) == 4:    # quad
-                elements.append(cell_node)
-
-    return elements, nodes
-
-
-def computeConnectivityMatrix(elements):
+
+def computeConnectivityMatrix(neighbors, ncells):
     """
-    Creates the connectivity matrix from a list of elements.
-    Two elements are connected if they share at least 2 nodes (2D side).
+    Creates the sparse (CSR) connectivity matrix from the calculus wall list.
+    Two elements are connected if they share a wall (lower triangle, C[j,i] with j>i).
     """
-    N = len(elements)
-    C = np.zeros((N, N), dtype=int)
-    for i in range(N):
-        for j in range(i+1, N):
-            if len(set(elements[i]) & set(elements[j])) >= 2:
-                C[j, i] = 1
-    return C
+    A = buildCellConnectivityFromNeighbors(neighbors, ncells)
+    return sparse.tril(A, k=-1, format="csr")
 
 
-def buildWalls(elements):
+# Calculus wall table: cells c1-c2 sharing wall n1-n2 (local wall iw1 in c1, iw2 in c2)
+WALL_DTYPE = np.dtype([
+    ("c1", np.int32), ("c2", np.int32),
+    ("iw1", np.int8), ("iw2", np.int8),
+    ("n1", np.int32), ("n2", np.int32)
+])
+
+
+def buildWalls(cells):
     """
-    Build wall list for an unstructured 2D mesh.
+    Build the half-edge table for an unstructured 2D mesh.
+    cells is a (ncells, 3|4) node id array, triangles padded with -1 in mixed meshes.
+    Returns edges (nhalf, 2) with sorted node ids, the owner cell and the local wall index.
     """
-    wall_map = []
+    cells = np.asarray(cells)
+    ncells, k = cells.shape
+    nv = np.count_nonzero(cells >= 0, axis=1)  # 3 or 4
 
-    for icell, inode in enumerate(elements):
-        n = len(inode)  # 3 or 4
+    j = np.arange(k)
+    valid = j < nv[:, None]
+    nxt = cells[np.arange(ncells)[:, None], (j + 1) % nv[:, None]]
 
-        for j in range(n):
-            p1 = inode[j]
-            p2 = inode[(j + 1) % n]
+    p1 = cells[valid]
+    p2 = nxt[valid]
 
-            # orientation-independent wall
-            id1, id2 = sorted((p1, p2))
+    # orientation-independent wall
+    edges = np.empty((p1.size, 2), dtype=np.int32)
+    np.minimum(p1, p2, out=edges[:, 0])
+    np.maximum(p1, p2, out=edges[:, 1])
 
-            wall_map.append({
-                "id1": id1, "id2": id2,
-                "cell": icell,
-                "iwall": j
-            })
+    cell = np.repeat(np.arange(ncells, dtype=np.int32), nv)
+    iwall = np.broadcast_to(j.astype(np.int8), (ncells, k))[valid]
 
-    return wall_map
+    return edges, cell, iwall
 
 
-def countWalls(wall_map):
+def countWalls(edges):
     """
-    Count interior and boundary walls for a list of walls.
+    Count interior and boundary walls from a half-edge table sorted by node ids.
     """
-    # Primero agrupamos las paredes por (id1, id2)
-    wall_groups = defaultdict(list)
-    for w in wall_map:
-        wall_groups[(w["id1"], w["id2"])].append(w["cell"])
-
-    n_interior = 0
-    n_boundary = 0
-    for cells in wall_groups.values():
-        if len(cells) == 2:
-            n_interior += 1
-        elif len(cells) == 1:
-            n_boundary += 1
+    starts = np.flatnonzero(np.r_[True, np.any(edges[1:] != edges[:-1], axis=1)])
+    sizes = np.diff(np.r_[starts, len(edges)])
+
+    n_interior = int(np.count_nonzero(sizes == 2))
+    n_boundary = int(np.count_nonzero(sizes == 1))
 
     return n_interior, n_boundary
 
 
-def buildNeighbornCells(elements):
+def buildBoundaryWalls(cells):
     """
-    Find interior walls and build cell adjacency.
+    Find the boundary walls (walls with a single owner cell).
+    Returns edges (nbound, 2) with sorted node ids, the owner cell and the local wall index.
+    """
+    edges, cell, iwall = buildWalls(cells)
+    order = np.lexsort((edges[:, 1], edges[:, 0]))
+    edges = edges[order]
+
+    same = np.all(edges[1:] == edges[:-1], axis=1)
+    single = ~(np.r_[same, False] | np.r_[False, same])
+    order = order[single]
+
+    return edges[single], cell[order], iwall[order]
+
+
+def buildNeighbornCells(cells):
+    """
+    Find interior walls and build cell adjacency as a WALL_DTYPE array.
     """
     # Create walls
-    walls = buildWalls(elements)
-    walls.sort(key=lambda w: (w["id1"], w["id2"])) #ordering by node index
-    msg=f"Walls map created: {len(walls)} edges"  
+    edges, cell, iwall = buildWalls(cells)
+    order = np.lexsort((edges[:, 1], edges[:, 0])) #ordering by node index
+    edges = edges[order]
+    cell = cell[order]
+    iwall = iwall[order]
+    msg=f"Walls map created: {len(edges)} edges"  
     log_info(msg)
 
     # Count walls
-    ncalc, nbound = countWalls(walls)
+    ncalc, nbound = countWalls(edges)
     msg=f"Calculus walls {ncalc} - Bound walls {nbound}"  
     log_info(msg)
 
-    # Build neighborn pairs
-    neighbors = []
-    for i in range(len(walls) - 1):
-        w1 = walls[i]
-        w2 = walls[i + 1]
-
-        if w1["id1"] == w2["id1"] and w1["id2"] == w2["id2"]:
-            calc_wall = {
-                "c1": w1["cell"],
-                "c2": w2["cell"],
-                "iw1": w1["iwall"],
-                "iw2": w2["iwall"],
-                "n1": w1["id1"],
-                "n2": w1["id2"]
-            }
-            
-            neighbors.append(calc_wall)
+    # Build neighborn pairs: consecutive half-edges with the same nodes
+    i = np.flatnonzero(np.all(edges[1:] == edges[:-1], axis=1))
+
+    neighbors = np.empty(len(i), dtype=WALL_DTYPE)
+    neighbors["c1"] = cell[i]
+    neighbors["c2"] = cell[i + 1]
+    neighbors["iw1"] = iwall[i]
+    neighbors["iw2"] = iwall[i + 1]
+    neighbors["n1"] = edges[i, 0]
+    neighbors["n2"] = edges[i, 1]
 
     # Ordering by cell index
-    neighbors.sort(key=lambda n: (n["c1"], n["c2"])) 
+    neighbors = neighbors[np.lexsort((neighbors["c2"], neighbors["c1"]))]
 
     return neighbors
 
@@ -355,66 +360,26 @@ def writeNeighbornCells(neighbors,output_file):
             f.write(f"{w['n1']} {w['n2']} {w['c1']} {w['c2']} {w['iw1']} {w['iw2']}\n") 
   
 
-def writeMeshReordered(filename, nodes, elements):
+def writeMeshReordered(filename, mesh, binary=False):
     """
-    Write a GMSH 2.2 ASCII .msh file
+    Write a GMSH 2.2 .msh file
 
     Parameters
     ----------
     filename : str
-    nodes : list of (x, y, z)
-    elements : list of list[int]
-        Node indices start at 0
+    mesh : meshArrays
+        Reordered mesh (node ids and cell connectivity)
+    binary : bool
+        Write binary MSH (2.2 1 8) instead of ASCII
     """
-
-    with open(filename, "w", encoding="ascii") as f:
-
-        # --- Mesh format ---
-        f.write("$MeshFormat\n")
-        f.write("2.2 0 8\n")
-        f.write("$EndMeshFormat\n")
-
-        # --- Nodes ---
-        f.write("$Nodes\n")
-        f.write(f"{len(nodes)}\n")
-
-        for i, (x, y) in enumerate(nodes):
-            f.write(f"{i+1} {x:.6f} {y:.6f} 0.0\n")
-
-        f.write("$EndNodes\n")
-
-        # --- Elements ---
-        f.write("$Elements\n")
-        f.write(f"{len(elements)}\n")
-
-        for i, elem in enumerate(elements):
-
-            if len(elem) == 3:
-                elem_type = 2   # triangle
-            elif len(elem) == 4:
-                elem_type = 3   # quad
-            else:
-                raise ValueError("Unsupported element type")
-
-            # GMSH minimal tags
-            num_tags = 2
-            phys_tag = 0
-            geom_tag = 1
-
-            nodes_str = " ".join(str(n) for n in elem)
-
-            f.write(
-                f"{i+1} {elem_type} {num_tags} {phys_tag} {geom_tag} {nodes_str}\n"
-            )
-
-        f.write("$EndElements\n")
+    writeMshFile(filename, mesh, binary)
 
 
 def reloadAndStyleMesh(var,iface):
     tools.remove_layer_by_name("mesh")
 
     project_folder = os.path.dirname(QgsProject.instance().fileName())
-    mesh_path = os.path.join(project_folder, "mesh.shp")
+    mesh_path = tools.meshLayerPath(project_folder)
     mesh = QgsVectorLayer(mesh_path, "mesh", "ogr")
     if not mesh.isValid():
         log_error("Domain mesh not found or invalid")
@@ -437,58 +402,87 @@ def reloadAndStyleMesh(var,iface):
     iface.mapCanvas().refresh()
 
 
-def plotConnectivityMatrix(matrix, output_file):
+def binSparsityPattern(rows, cols, nrows, ncols, bins=2000):
     """
-    Saves the connectivity matrix as an image file.
+    Density image of a sparsity pattern: nonzeros (rows, cols) are counted in
+    a fixed grid of at most bins x bins pixels.
     """
-    N = matrix.shape[0]
-    #size = max(10, N/100)   # escala automática
-    size=10
-    plt.figure(figsize=(size, size))
+    brows = max(1, min(bins, nrows))
+    bcols = max(1, min(bins, ncols))
+
+    ri = (np.asarray(rows, dtype=np.int64) * brows) // max(nrows, 1)
+    ci = (np.asarray(cols, dtype=np.int64) * bcols) // max(ncols, 1)
+
+    image = np.bincount(ri * bcols + ci, minlength=brows * bcols)
+    return image.reshape(brows, bcols)
+
+
+def plotDensityImage(image, extent, cmap):
+    if image.max() > 1:
+        norm = colors.LogNorm(vmin=1, vmax=image.max())
+    else:
+        norm = colors.Normalize(vmin=0, vmax=1)
 
-    plt.imshow(
-        matrix, 
-        cmap='gray_r', 
+    masked = np.ma.masked_equal(image, 0)
+    im = plt.imshow(
+        masked,
+        cmap=cmap,
+        norm=norm,
         origin='lower',
         interpolation='nearest',
-        vmin=0,vmax=1
+        extent=extent,
+        aspect='auto'
     )
+    return im
+
+
+def plotConnectivityMatrix(matrix, output_file, bins=2000):
+    """
+    Saves the sparsity pattern of the connectivity matrix as a density image.
+    Memory and time scale with the number of walls, not with N².
+    """
+    N = matrix.shape[0]
+    coo = matrix.tocoo()
+    image = binSparsityPattern(coo.row, coo.col, N, N, bins)
+
+    size=10
+    plt.figure(figsize=(size, size))
+
+    im = plotDensityImage(image, [0, N, 0, N], 'gray_r')
 
     x0=np.array([0,N-1])
     y0=np.array([0,N-1])
     plt.plot(x0,y0,color='red',linewidth=1)
     
     plt.title("Connectivity Matrix")
-    plt.colorbar(label='Connection')
+    plt.colorbar(im, label='Connections per pixel')
     plt.tight_layout()
     
     plt.savefig(output_file, dpi=300)
     plt.close()  # close the figure to free memory
 
 
-def plotNeighbornConnectivity(neighbors, output_file):
+def plotNeighbornConnectivity(neighbors, output_file, bins=2000):
     """
-    Plot idWall vs cell1 and cell2, coloring points by idWall.
+    Density image of idWall vs cell1 and cell2.
     """
-    colormap="jet"
-    point_size=12
-
-    idwalls = np.arange(len(neighbors))
-    cell1 = np.array([w["c1"] for w in neighbors])
-    cell2 = np.array([w["c2"] for w in neighbors])
-
-    norm = plt.Normalize(vmin=idwalls.min(), vmax=idwalls.max())
-    cmap = cm.get_cmap(colormap)
+    nwalls = len(neighbors)
+    ncells = int(max(neighbors["c1"].max(initial=0), neighbors["c2"].max(initial=0))) + 1
+
+    idwalls = np.arange(nwalls)
+    image = binSparsityPattern(
+        np.concatenate((neighbors["c1"], neighbors["c2"])),
+        np.concatenate((idwalls, idwalls)),
+        ncells, nwalls, bins
+    )
 
     plt.figure(figsize=(10,10))
-    plt.scatter(idwalls, cell1, c=idwalls, cmap=cmap, norm=norm, s=point_size, label="cell-1", marker='+',linewidths=0.5)
-    plt.scatter(idwalls, cell2, c=idwalls, cmap=cmap, norm=norm, s=point_size, label="cell-2", marker='x',linewidths=0.5)
+    im = plotDensityImage(image, [0, nwalls, 0, ncells], 'jet')
 
     plt.xlabel("Wall ID")
     plt.ylabel("Cell index")
-    plt.title("Wall ID vs Cells (colored by Wall ID)")
-    plt.colorbar(cm.ScalarMappable(norm=norm, cmap=cmap), label="Wall ID")
-    plt.legend()
+    plt.title("Wall ID vs Cells (cell-1 and cell-2 density)")
+    plt.colorbar(im, label="Cells per pixel")
     plt.grid(True)
     plt.tight_layout()
 
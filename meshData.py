@@ -0,0 +1,530 @@
+######################## PeKa2D-v5 Graphical User Interface (GUI) #########################
+
+# PeKa2D-v5 GUI plugin for QGIS 3
+# © 2025 Sergio Martínez-Aranda. License CC BY-NC-SA 4.0
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+
+###########################################################################################
+
+import os
+import numpy as np
+from .messages import (
+    log_info,
+    log_error,
+    log_warning
+)
+
+# GMSH element types for 2D cells -> number of vertices
+GMSH_CELL_TYPES = {
+    2: 3,   # triangle
+    3: 4    # quad
+}
+
+# GMSH (MSH 2) element types -> number of nodes, needed to skip binary blocks
+GMSH_NODES_PER_TYPE = {
+    1: 2, 2: 3, 3: 4, 4: 4, 5: 8, 6: 6, 7: 5, 8: 3, 9: 6,
+    10: 9, 11: 10, 12: 27, 13: 18, 14: 14, 15: 1, 16: 8, 17: 20
+}
+
+# Rows formatted per call when writing ASCII files
+WRITE_CHUNK = 200000
+
+# Cached cell geometry, stored next to the .msh file
+GEOMETRY_FILE = "mesh_geometry.npz"
+
+
+class meshArrays:
+    """
+    Array-backed 2D mesh shared by ORDERING, EXPORT and mesh layer generation.
+
+    Attributes
+    ----------
+    node_tags : int32 (nnodes,)
+        GMSH node ids
+    nodes : float64 (nnodes, 2)
+        XY node coordinates
+    cells : int32 (ncells, 3|4)
+        GMSH node ids of every 2D cell. Triangles in mixed meshes are padded with -1
+    cell_type : int8 (ncells,)
+        GMSH element type (2 triangle, 3 quad)
+    phys_tags, geom_tags : int32 (ncells,)
+        First two GMSH tags of every cell (0 if missing)
+    """
+
+    def __init__(self, node_tags, nodes, cells, cell_type, phys_tags=None, geom_tags=None):
+        self.node_tags = np.ascontiguousarray(node_tags, dtype=np.int32)
+        self.nodes = np.ascontiguousarray(nodes, dtype=np.float64)
+        self.cells = np.ascontiguousarray(cells, dtype=np.int32)
+        self.cell_type = np.ascontiguousarray(cell_type, dtype=np.int8)
+
+        ncells = self.cells.shape[0]
+        if phys_tags is None:
+            phys_tags = np.zeros(ncells, dtype=np.int32)
+        if geom_tags is None:
+            geom_tags = np.ones(ncells, dtype=np.int32)
+        self.phys_tags = np.ascontiguousarray(phys_tags, dtype=np.int32)
+        self.geom_tags = np.ascontiguousarray(geom_tags, dtype=np.int32)
+
+    @property
+    def nnodes(self):
+        return self.nodes.shape[0]
+
+    @property
+    def ncells(self):
+        return self.cells.shape[0]
+
+    @property
+    def nverts(self):
+        """Number of vertices of every cell"""
+        return np.where(self.cell_type == 3, 4, 3).astype(np.int8)
+
+    @property
+    def vertexXcell(self):
+        """Vertices per cell of the widest element in the mesh"""
+        return self.cells.shape[1]
+
+    def isUniform(self):
+        """True if all the cells are of the same element type"""
+        return self.ncells == 0 or bool(np.all(self.cell_type == self.cell_type[0]))
+
+    def cellsOfType(self, elem_type):
+        """Connectivity (node ids) of the cells with the given GMSH type"""
+        nv = GMSH_CELL_TYPES[elem_type]
+        return self.cells[self.cell_type == elem_type, :nv]
+
+    def nodeIndex(self, tags):
+        """Map GMSH node ids to row positions in the nodes array"""
+        tags = np.asarray(tags)
+        n = self.nnodes
+        if n and self.node_tags[0] == 1 and self.node_tags[-1] == n:
+            return tags - 1  # contiguous 1..n numbering (standard GMSH output)
+        order = np.argsort(self.node_tags, kind="stable")
+        pos = np.searchsorted(self.node_tags, tags, sorter=order)
+        return order[pos]
+
+    def cellCentroids(self):
+        """Vertex average of every cell (XY)"""
+        idx = self.nodeIndex(self.cells)
+        valid = self.cells >= 0
+        xy = self.nodes[np.where(valid, idx, 0)] * valid[:, :, None]
+        return xy.sum(axis=1) / valid.sum(axis=1)[:, None]
+
+    def layerOrder(self):
+        """Cell positions in mesh layer order (triangles first, then quads)"""
+        return np.argsort(self.cell_type, kind="stable")
+
+    def cellVertices(self, order=None):
+        """
+        XY vertices (ncells, 4, 2) of the cells in the given order.
+        Triangles are padded by repeating their last vertex.
+        """
+        cells = self.cells if order is None else self.cells[order]
+        if cells.shape[1] == 3:
+            cells = np.column_stack([cells, cells[:, 2]])
+        cells = np.where(cells >= 0, cells, cells[:, 2:3])
+        return self.nodes[self.nodeIndex(cells)]
+
+    def permuteCells(self, perm):
+        """New mesh with cells in perm order (perm[new] = old)"""
+        return meshArrays(
+            self.node_tags, self.nodes,
+            self.cells[perm], self.cell_type[perm],
+            self.phys_tags[perm], self.geom_tags[perm]
+        )
+
+    def renumberNodes(self, node_perm):
+        """
+        New mesh with nodes in node_perm order (node_perm[new] = old row),
+        renumbered 1..nnodes, and cell connectivity rewritten consistently.
+        """
+        inv = np.empty(self.nnodes, dtype=np.int64)
+        inv[node_perm] = np.arange(self.nnodes)
+
+        valid = self.cells >= 0
+        cells = np.where(valid, inv[self.nodeIndex(np.where(valid, self.cells, self.node_tags[0]))] + 1, -1)
+
+        return meshArrays(
+            np.arange(1, self.nnodes + 1), self.nodes[node_perm],
+            cells, self.cell_type,
+            self.phys_tags, self.geom_tags
+        )
+
+
+def cellPolygonWkb(mesh, cells):
+    """
+    WKB polygons (little endian, closed ring) of the given cell positions,
+    built with one structured array per element type.
+    """
+    verts = mesh.cellVertices(cells)
+    nverts = mesh.nverts[cells]
+    wkb = [None] * len(cells)
+
+    for nv in (3, 4):
+        sel = np.flatnonzero(nverts == nv)
+        if len(sel) == 0:
+            continue
+        dtype = np.dtype([
+            ("byte_order", "u1"), ("wkb_type", "<u4"), ("nrings", "<u4"),
+            ("npoints", "<u4"), ("xy", "<f8", (nv + 1, 2))
+        ])
+        records = np.empty(len(sel), dtype=dtype)
+        records["byte_order"] = 1
+        records["wkb_type"] = 3  # Polygon
+        records["nrings"] = 1
+        records["npoints"] = nv + 1
+        records["xy"][:, :nv] = verts[sel, :nv]
+        records["xy"][:, nv] = verts[sel, 0]
+
+        raw = records.tobytes()
+        size = dtype.itemsize
+        for k, i in enumerate(sel.tolist()):
+            wkb[i] = raw[k * size:(k + 1) * size]
+
+    return wkb
+
+
+def computeCellGeometry(mesh):
+    """
+    Centroid, area, bounding box and edge lengths of every cell, in mesh
+    layer order. Edge k joins vertices k and k+1 (cyclic), so the padded
+    edge of a triangle (k=2) has zero length.
+    """
+    order = mesh.layerOrder()
+    verts = mesh.cellVertices(order)
+    x = verts[:, :, 0]
+    y = verts[:, :, 1]
+    x1 = np.roll(x, -1, axis=1)
+    y1 = np.roll(y, -1, axis=1)
+
+    # Shoelace area and centroid
+    cross = x * y1 - x1 * y
+    area2 = cross.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cx = ((x + x1) * cross).sum(axis=1) / (3.0 * area2)
+        cy = ((y + y1) * cross).sum(axis=1) / (3.0 * area2)
+    degenerate = area2 == 0.0
+    cx[degenerate] = x[degenerate].mean(axis=1)
+    cy[degenerate] = y[degenerate].mean(axis=1)
+
+    return {
+        "cell": order.astype(np.int32),
+        "centroid": np.column_stack([cx, cy]),
+        "area": 0.5 * np.abs(area2),
+        "bbox": np.column_stack([x.min(axis=1), y.min(axis=1), x.max(axis=1), y.max(axis=1)]),
+        "edge_length": np.hypot(x1 - x, y1 - y),
+    }
+
+
+def writeCellGeometry(msh_path, mesh):
+    """Compute the cell geometry of a mesh and store it next to its .msh file"""
+    geometry = computeCellGeometry(mesh)
+    geometry_path = os.path.join(os.path.dirname(os.path.abspath(msh_path)), GEOMETRY_FILE)
+    key = np.array(_fileKey(os.path.abspath(msh_path)), dtype=np.int64)
+    with open(geometry_path, "wb") as f:
+        np.savez(f, msh_key=key, **geometry)
+
+    msg=f"Mesh cell geometry cached: {os.path.basename(geometry_path)}"
+    log_info(msg)
+
+    return geometry
+
+
+def loadCellGeometry(msh_path):
+    """
+    Cell geometry of the mesh in msh_path (mesh layer order). The cached
+    file is reused while it matches the .msh file; otherwise it is rebuilt.
+    """
+    geometry_path = os.path.join(os.path.dirname(os.path.abspath(msh_path)), GEOMETRY_FILE)
+    key = _fileKey(os.path.abspath(msh_path))
+
+    if os.path.exists(geometry_path):
+        with np.load(geometry_path) as data:
+            if tuple(data["msh_key"].tolist()) == key:
+                return {name: data[name] for name in data.files if name != "msh_key"}
+
+    return writeCellGeometry(msh_path, loadMesh(msh_path))
+
+
+# Parsed meshes: abspath -> ((mtime_ns, size), meshArrays)
+_MESH_CACHE = {}
+
+
+def _fileKey(filename):
+    st = os.stat(filename)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def loadMesh(filename):
+    """
+    Return the meshArrays of a .msh file, parsing it only if the file has
+    changed (path + mtime + size) since the last call.
+    """
+    path = os.path.abspath(filename)
+    key = _fileKey(path)
+
+    cached = _MESH_CACHE.get(path)
+    if cached is not None and cached[0] == key:
+        msg=f"Mesh MSH file reused from cache: {os.path.basename(path)}"
+        log_info(msg)
+        return cached[1]
+
+    mesh = readMshFile(path)
+    _MESH_CACHE[path] = (key, mesh)
+    msg=f"Mesh MSH file read: {mesh.nnodes} nodes - {mesh.ncells} cells"
+    log_info(msg)
+
+    return mesh
+
+
+def storeMesh(filename, mesh):
+    """
+    Register a mesh just written to filename so that the next loadMesh
+    does not parse it again.
+    """
+    path = os.path.abspath(filename)
+    _MESH_CACHE[path] = (_fileKey(path), mesh)
+
+
+def readMshFile(filename):
+    """
+    Reads a GMSH .msh file (version 2, ASCII or binary) into a meshArrays object.
+    The $Nodes and $Elements sections are parsed in bulk with NumPy.
+    Only 2D elements (triangles and quads) are kept.
+    """
+    with open(filename, "rb") as f:
+        data = f.read()
+
+    if _isBinary(data):
+        return _readMshBinary(data, filename)
+
+    nodes_block, nnodes = _section(data, b"$Nodes", b"$EndNodes")
+    elems_block, nelem = _section(data, b"$Elements", b"$EndElements")
+
+    # --- Nodes: id x y z ---
+    values = np.fromstring(nodes_block, dtype=np.float64, sep=" ")
+    if values.size != 4 * nnodes:
+        raise ValueError(f"Malformed $Nodes section in {filename}")
+    values = values.reshape(nnodes, 4)
+    node_tags = values[:, 0].astype(np.int32)
+    nodes = values[:, 1:3].copy()
+    del values
+
+    # --- Elements: id type ntags tags... nodes... ---
+    flat, first = _tokenizeLines(elems_block)
+    if first.size != nelem:
+        raise ValueError(f"Malformed $Elements section in {filename}")
+
+    etype = flat[first + 1]
+    keep = np.isin(etype, list(GMSH_CELL_TYPES))
+    first = first[keep]
+    etype = etype[keep].astype(np.int8)
+    ntags = flat[first + 2]
+    start = first + 3 + ntags
+
+    phys_tags = np.where(ntags >= 1, flat[first + 3], 0)
+    geom_tags = np.where(ntags >= 2, flat[first + 4], 0)
+
+    nvmax = max((GMSH_CELL_TYPES[t] for t in np.unique(etype)), default=3)
+    cells = np.full((first.size, nvmax), -1, dtype=np.int32)
+    for t, nv in GMSH_CELL_TYPES.items():
+        rows = np.flatnonzero(etype == t)
+        if rows.size:
+            cells[rows, :nv] = flat[start[rows, None] + np.arange(nv)]
+
+    return meshArrays(node_tags, nodes, cells, etype, phys_tags, geom_tags)
+
+
+def _isBinary(data):
+    """Read the file-type flag of the $MeshFormat line"""
+    i0 = data.index(b"$MeshFormat")
+    i0 = data.index(b"\n", i0) + 1
+    eol = data.index(b"\n", i0)
+    version, file_type, data_size = data[i0:eol].split()[:3]
+    if not version.startswith(b"2"):
+        raise ValueError(f"Non supported MSH version: {version.decode()} (MSH 2 required)")
+    return int(file_type) == 1
+
+
+def _readMshBinary(data, filename):
+    """
+    Binary MSH 2.2: $Nodes as (int id, 3 doubles) records and $Elements as
+    blocks of (type, count, ntags) headers followed by int records.
+    """
+    i0 = data.index(b"$MeshFormat")
+    i0 = data.index(b"\n", data.index(b"\n", i0) + 1) + 1
+    endian = "<" if np.frombuffer(data, "<i4", 1, i0)[0] == 1 else ">"
+    int4 = np.dtype(endian + "i4")
+
+    # --- Nodes ---
+    pos, nnodes = _countLine(data, data.index(b"$Nodes", i0))
+    rec = np.dtype([("id", int4), ("xyz", endian + "f8", (3,))])
+    values = np.frombuffer(data, rec, nnodes, pos)
+    node_tags = values["id"].astype(np.int32)
+    nodes = values["xyz"][:, :2].copy()
+    pos += nnodes * rec.itemsize
+
+    # --- Elements ---
+    pos, nelem = _countLine(data, data.index(b"$Elements", pos))
+    blocks = []
+    read = 0
+    while read < nelem:
+        etype, count, ntags = np.frombuffer(data, int4, 3, pos).tolist()
+        pos += 12
+        if etype not in GMSH_NODES_PER_TYPE:
+            raise ValueError(f"Non supported element type {etype} in {filename}")
+        reclen = 1 + ntags + GMSH_NODES_PER_TYPE[etype]
+        block = np.frombuffer(data, int4, count * reclen, pos).reshape(count, reclen)
+        pos += 4 * block.size
+        read += count
+
+        if etype in GMSH_CELL_TYPES:
+            blocks.append((etype, ntags, block))
+
+    nvmax = max((GMSH_CELL_TYPES[t] for t, _, _ in blocks), default=3)
+    ncells = sum(len(b) for _, _, b in blocks)
+    cells = np.full((ncells, nvmax), -1, dtype=np.int32)
+    etype = np.empty(ncells, dtype=np.int8)
+    phys_tags = np.zeros(ncells, dtype=np.int32)
+    geom_tags = np.zeros(ncells, dtype=np.int32)
+
+    row = 0
+    for t, ntags, block in blocks:
+        nv = GMSH_CELL_TYPES[t]
+        sl = slice(row, row + len(block))
+        cells[sl, :nv] = block[:, 1 + ntags:]
+        etype[sl] = t
+        if ntags >= 1:
+            phys_tags[sl] = block[:, 1]
+        if ntags >= 2:
+            geom_tags[sl] = block[:, 2]
+        row += len(block)
+
+    return meshArrays(node_tags, nodes, cells, etype, phys_tags, geom_tags)
+
+
+def _countLine(data, i0):
+    """Position after the count line of a $Section and the count"""
+    i0 = data.index(b"\n", i0) + 1
+    eol = data.index(b"\n", i0)
+    return eol + 1, int(data[i0:eol])
+
+
+def writeMshFile(filename, mesh, binary=False):
+    """
+    Write a GMSH 2.2 .msh file (ASCII or binary) from a meshArrays object.
+    Node and element blocks are formatted in chunks of WRITE_CHUNK rows.
+    Cells are written with their physical and geometrical tags.
+    """
+    ncells = mesh.ncells
+    nnodes = mesh.nnodes
+    elem_ids = np.arange(1, ncells + 1, dtype=np.int32)
+
+    with open(filename, "wb") as f:
+
+        # --- Mesh format ---
+        f.write(b"$MeshFormat\n")
+        if binary:
+            f.write(b"2.2 1 8\n")
+            f.write(np.array([1], dtype="<i4").tobytes())
+            f.write(b"\n")
+        else:
+            f.write(b"2.2 0 8\n")
+        f.write(b"$EndMeshFormat\n")
+
+        # --- Nodes ---
+        f.write(f"$Nodes\n{nnodes}\n".encode("ascii"))
+        if binary:
+            rec = np.zeros(nnodes, dtype=[("id", "<i4"), ("xyz", "<f8", (3,))])
+            rec["id"] = mesh.node_tags
+            rec["xyz"][:, :2] = mesh.nodes
+            f.write(rec.tobytes())
+            f.write(b"\n")
+        else:
+            fmt = "%d %.6f %.6f 0.0\n"
+            for a in range(0, nnodes, WRITE_CHUNK):
+                b = min(a + WRITE_CHUNK, nnodes)
+                rows = zip(mesh.node_tags[a:b].tolist(), *mesh.nodes[a:b].T.tolist())
+                f.write("".join(map(fmt.__mod__, rows)).encode("ascii"))
+        f.write(b"$EndNodes\n")
+
+        # --- Elements ---
+        f.write(f"$Elements\n{ncells}\n".encode("ascii"))
+        if binary:
+            # one block per run of consecutive cells of the same type
+            cuts = np.flatnonzero(mesh.cell_type[1:] != mesh.cell_type[:-1]) + 1
+            for a, b in zip(np.r_[0, cuts], np.r_[cuts, ncells]):
+                if b <= a:
+                    continue
+                t = int(mesh.cell_type[a])
+                nv = GMSH_CELL_TYPES[t]
+                block = np.empty((b - a, 3 + nv), dtype="<i4")
+                block[:, 0] = elem_ids[a:b]
+                block[:, 1] = mesh.phys_tags[a:b]
+                block[:, 2] = mesh.geom_tags[a:b]
+                block[:, 3:] = mesh.cells[a:b, :nv]
+                f.write(np.array([t, b - a, 2], dtype="<i4").tobytes())
+                f.write(block.tobytes())
+            f.write(b"\n")
+        else:
+            fmts = {t: "%d " + f"{t} 2" + " %d %d" + " %d" * nv + "\n" for t, nv in GMSH_CELL_TYPES.items()}
+            for a in range(0, ncells, WRITE_CHUNK):
+                b = min(a + WRITE_CHUNK, ncells)
+                if mesh.isUniform():
+                    t = int(mesh.cell_type[0])
+                    rows = zip(
+                        elem_ids[a:b].tolist(), mesh.phys_tags[a:b].tolist(), mesh.geom_tags[a:b].tolist(),
+                        *mesh.cells[a:b, :GMSH_CELL_TYPES[t]].T.tolist()
+                    )
+                    chunk = "".join(map(fmts[t].__mod__, rows))
+                else:
+                    types = mesh.cell_type[a:b].tolist()
+                    cells = mesh.cells[a:b].tolist()
+                    tags = zip(mesh.phys_tags[a:b].tolist(), mesh.geom_tags[a:b].tolist())
+                    chunk = "".join(
+                        fmts[t] % (i, *tag, *c[:GMSH_CELL_TYPES[t]])
+                        for i, t, tag, c in zip(elem_ids[a:b].tolist(), types, tags, cells)
+                    )
+                f.write(chunk.encode("ascii"))
+        f.write(b"$EndElements\n")
+
+
+def _section(data, begin, end):
+    """Return the body of a $Section (without its count line) and the count"""
+    i0 = data.find(begin)
+    i1 = data.find(end, i0)
+    if i0 < 0 or i1 < 0:
+        raise ValueError(f"Section {begin.decode()} not found in MSH file")
+
+    i0 = data.index(b"\n", i0) + 1      # skip section keyword
+    eol = data.index(b"\n", i0)         # count line
+    count = int(data[i0:eol])
+
+    return data[eol + 1:i1], count
+
+
+def _tokenizeLines(block):
+    """
+    Parse a block of whitespace separated integers with a variable number of
+    tokens per line. Returns the flat token array and the position of the
+    first token of every non-empty line.
+    """
+    flat = np.fromstring(block, dtype=np.int64, sep=" ")
+    if flat.size == 0:
+        return flat, np.zeros(0, dtype=np.int64)
+
+    buf = np.frombuffer(block, dtype=np.uint8)
+    blank = buf <= 32
+    tok_start = ~blank
+    tok_start[1:] &= blank[:-1]
+    tok_start = np.flatnonzero(tok_start)
+    del blank
+
+    newlines = np.flatnonzero(buf == 10)
+    line_of_tok = np.searchsorted(newlines, tok_start, side="right")
+    if line_of_tok.size != flat.size:
+        raise ValueError("Non-integer token found in MSH elements section")
+
+    # first token of every line = where the line index changes
+    first = np.flatnonzero(np.r_[True, line_of_tok[1:] != line_of_tok[:-1]])
+
+    return flat, first
@@ -9,16 +9,16 @@
 from qgis.PyQt.QtWidgets import QAction, QMessageBox
 from qgis.PyQt.QtGui import QColor
 from qgis.core import (
-    QgsProject, QgsVectorLayer, QgsField, QgsFields, QgsVectorFileWriter, QgsMeshLayer, QgsPointXY, QgsFeature, QgsGeometry,
+    QgsProject, QgsVectorLayer, QgsField, QgsFields, QgsVectorFileWriter, QgsMeshLayer, QgsFeature, QgsGeometry,
     QgsSimpleFillSymbolLayer, QgsFillSymbol, QgsSingleSymbolRenderer, QgsUnitTypes,
-    QgsMessageLog, Qgis
+    QgsMessageLog, Qgis, QgsWkbTypes
 )
 from PyQt5.QtCore import QVariant
 import os
 import shutil
 import subprocess
-import meshio
 from . import tools
+from .meshData import loadMesh, writeCellGeometry, cellPolygonWkb
 from .messages import (
     log_info,
     log_error,
@@ -26,6 +26,9 @@ from .messages import (
     log_gmsh
 )
 
+# Features passed to the mesh layer writer per addFeatures call
+MESH_LAYER_BATCH = 50000
+
 
 def generateMesh(self):
 
@@ -93,9 +96,9 @@ def generateMesh(self):
     log_info(msg)   
     #QMessageBox.information(None, "MESHING", "Mesh MSH file generated correctly")
     
-    # Generate mesh shp layer
-    shp_path = os.path.join(project_folder, "mesh.shp")
-    generateMeshLayer(project_crs,msh_path,shp_path)
+    # Generate mesh layer
+    layer_path = tools.meshLayerPath(project_folder, existing=False)
+    generateMeshLayer(project_crs,msh_path,layer_path)
     
     #reload mesh layer with zbed
     reloadAndStyleMesh("idx",self.iface)
@@ -368,52 +371,78 @@ def generateMeshFromGeo(geo_path, msh_path):
         raise RuntimeError("Gmsh fails. Check log file")      
 
 
-def generateMeshLayer(project_crs,msh_path,shp_path):
-
-    mesh = meshio.read(msh_path)
-
-    points = mesh.points[:, :2]  # XY
-    triangles = mesh.cells_dict.get("triangle", [])
-    quads = mesh.cells_dict.get("quad", [])
-
-    shp_layer = QgsVectorLayer(f"Polygon?crs={project_crs.authid()}","temp_mesh","memory")
-    pr = shp_layer.dataProvider()
-    pr.addAttributes([QgsField("idx", QVariant.Int)])
-    shp_layer.updateFields()
-
-    fid = 0 # Memory index
-    # --- TRIÁNGULOS ---
-    for tri in triangles:
-        pts = [QgsPointXY(*points[idx]) for idx in tri]
-        feat = QgsFeature()
-        feat.setGeometry(QgsGeometry.fromPolygonXY([pts]))
-        feat.setAttributes([fid])
-        pr.addFeature(feat)
-        fid += 1
-
-    # --- QUADS ---
-    for quad in quads:
-        pts = [QgsPointXY(*points[idx]) for idx in quad]
-        feat = QgsFeature()
-        feat.setGeometry(QgsGeometry.fromPolygonXY([pts]))
-        feat.setAttributes([fid])
-        pr.addFeature(feat)
-        fid += 1
-
-    QgsVectorFileWriter.writeAsVectorFormat(
-        shp_layer,
-        shp_path,
-        "UTF-8",
+def generateMeshLayer(project_crs,msh_path,layer_path):
+
+    mesh = loadMesh(msh_path)
+    order = mesh.layerOrder()  # triangles first, then quads
+
+    # Cell index and GMSH node ids (n4 = -1 for triangles in mixed meshes)
+    node_fields = [f"n{k+1}" for k in range(mesh.vertexXcell)]
+    fields = QgsFields()
+    fields.append(QgsField("idx", QVariant.Int))
+    for name in node_fields:
+        fields.append(QgsField(name, QVariant.Int))
+
+    # Output driver selected by the user (GPKG or ESRI Shapefile)
+    driver = tools.meshLayerDriver()
+    options = QgsVectorFileWriter.SaveVectorOptions()
+    options.driverName = driver
+    options.fileEncoding = "UTF-8"
+    options.layerName = "mesh"
+    options.layerOptions = tools.MESH_LAYER_DRIVERS[driver][1]
+
+    # Release the loaded mesh layer before overwriting its file
+    tools.remove_layer_by_name("mesh")
+
+    # Mesh layers in other formats and the FlatGeobuf read copy of the
+    # previous mesh are stale from now on
+    project_folder = os.path.dirname(layer_path)
+    tools.removeOtherMeshLayers(project_folder, driver)
+    copy_path = os.path.join(project_folder, tools.MESH_COPY_FILE)
+    if os.path.exists(copy_path):
+        os.remove(copy_path)
+
+    writer = QgsVectorFileWriter.create(
+        layer_path,
+        fields,
+        QgsWkbTypes.Polygon,
         project_crs,
-        "ESRI Shapefile"
+        QgsProject.instance().transformContext(),
+        options
     )
+    if writer.hasError() != QgsVectorFileWriter.NoError:
+        msg=f"Mesh layer could not be created: {writer.errorMessage()}"
+        log_error(msg)
+        return
+
+    # Stream the cells in batches, geometries built as WKB from the mesh arrays
+    for start in range(0, mesh.ncells, MESH_LAYER_BATCH):
+        stop = min(start + MESH_LAYER_BATCH, mesh.ncells)
+        cells = order[start:stop]
+        features = []
+        for idx, wkb, nodes in zip(range(start, stop), cellPolygonWkb(mesh, cells), mesh.cells[cells].tolist()):
+            geom = QgsGeometry()
+            geom.fromWkb(wkb)
+            feat = QgsFeature(fields)
+            feat.setGeometry(geom)
+            feat.setAttributes([idx] + nodes)
+            features.append(feat)
+        writer.addFeatures(features)
+
+    del writer  # close the file
+
+    msg=f"Mesh layer written: {mesh.ncells} cells ({driver})"
+    log_info(msg)
+
+    # Cell centroids, areas, bounding boxes and edge lengths for later operations
+    writeCellGeometry(msh_path, mesh)
 
 
 def reloadAndStyleMesh(var,iface):
     tools.remove_layer_by_name("mesh")
 
     project_folder = os.path.dirname(QgsProject.instance().fileName())
-    mesh_path = os.path.join(project_folder, "mesh.shp")
+    mesh_path = tools.meshLayerPath(project_folder)
     mesh = QgsVectorLayer(mesh_path, "mesh", "ogr")
     if not mesh.isValid():
         log_error("Domain mesh not found or invalid")
@@ -0,0 +1,125 @@
+######################## PeKa2D-v5 Graphical User Interface (GUI) #########################
+
+# PeKa2D-v5 GUI plugin for QGIS 3
+# © 2025 Sergio Martínez-Aranda. License CC BY-NC-SA 4.0
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+
+###########################################################################################
+
+import json
+import numpy as np
+from .messages import (
+    log_info,
+    log_error,
+    log_warning
+)
+
+
+def computeBandwidthProfile(neighbors, ncells):
+    """
+    Bandwidth and profile (envelope size) of the symmetric cell connectivity
+    matrix, computed directly from the calculus wall table.
+    """
+    if len(neighbors) == 0:
+        return 0, 0
+
+    c1 = neighbors["c1"].astype(np.int64)
+    c2 = neighbors["c2"].astype(np.int64)
+    hi = np.maximum(c1, c2)
+    lo = np.minimum(c1, c2)
+
+    bandwidth = int(np.max(hi - lo))
+
+    # first non-zero column of every row in the lower triangle
+    first = np.arange(ncells, dtype=np.int64)
+    order = np.lexsort((lo, hi))
+    rows, idx = np.unique(hi[order], return_index=True)
+    first[rows] = lo[order][idx]
+    profile = int(np.sum(np.arange(ncells, dtype=np.int64) - first))
+
+    return bandwidth, profile
+
+
+def computeWallLocality(neighbors):
+    """
+    Mean and maximum index distance |c1-c2| across calculus walls.
+    """
+    if len(neighbors) == 0:
+        return 0.0, 0
+
+    dist = np.abs(neighbors["c1"].astype(np.int64) - neighbors["c2"])
+    return float(dist.mean()), int(dist.max())
+
+
+def computeNodeCacheReuse(mesh, window=8, line_bytes=64):
+    """
+    Cache-line reuse of the node coordinate array when cells are visited in order.
+    Every cell reads the XY coordinates (2 x float64) of its nodes; an access is
+    counted as a reuse if the same cache line was read by one of the previous
+    `window` cells. Also returns the mean node index span per cell.
+    """
+    nodes_per_line = max(1, line_bytes // (2 * 8))
+
+    idx = mesh.nodeIndex(mesh.cells).astype(np.int64)
+    valid = mesh.cells >= 0
+    first = idx[:, 0]  # always a valid node
+    span = np.where(valid, idx, first[:, None]).max(axis=1) - np.where(valid, idx, first[:, None]).min(axis=1)
+
+    line = (idx[valid] // nodes_per_line).astype(np.int64)
+    cell = np.broadcast_to(np.arange(mesh.ncells)[:, None], mesh.cells.shape)[valid]
+    if line.size == 0:
+        return 0.0, 0.0
+
+    # previous access to the same line (accesses are already in visiting order)
+    order = np.argsort(line, kind="stable")
+    line_s = line[order]
+    cell_s = cell[order]
+    same = line_s[1:] == line_s[:-1]
+    gap = cell_s[1:] - cell_s[:-1]
+    hits = np.count_nonzero(same & (gap <= window))
+
+    return float(hits / line.size), float(span.mean())
+
+
+def computeOrderingMetrics(mesh, neighbors):
+    """
+    Reordering quality metrics computed from the wall table and cell arrays.
+    """
+    bandwidth, profile = computeBandwidthProfile(neighbors, mesh.ncells)
+    mean_dist, max_dist = computeWallLocality(neighbors)
+    reuse, span = computeNodeCacheReuse(mesh)
+
+    return {
+        "ncells": int(mesh.ncells),
+        "nnodes": int(mesh.nnodes),
+        "nwalls": int(len(neighbors)),
+        "bandwidth": bandwidth,
+        "profile": profile,
+        "mean_wall_distance": mean_dist,
+        "max_wall_distance": max_dist,
+        "node_cache_reuse": reuse,
+        "mean_cell_node_span": span
+    }
+
+
+def logOrderingMetrics(metrics, label):
+    msg=(
+        f"{label} | bandwidth: {metrics['bandwidth']} - profile: {metrics['profile']}"
+        f" - mean |c1-c2|: {metrics['mean_wall_distance']:.1f}"
+        f" - node cache reuse: {100*metrics['node_cache_reuse']:.1f}%"
+        f" - mean cell node span: {metrics['mean_cell_node_span']:.1f}"
+    )
+    log_info(msg)
+
+
+def writeOrderingMetrics(json_path, strategy, before, after):
+    """
+    Export the before/after metrics of a reordering as JSON.
+    """
+    report = {
+        "strategy": strategy,
+        "before": before,
+        "after": after
+    }
+    with open(json_path, "w") as f:
+        json.dump(report, f, indent=2)
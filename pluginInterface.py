@@ -12,8 +12,9 @@ from qgis.PyQt.QtWidgets import (
 from qgis.PyQt.QtGui import QIcon
 from qgis.PyQt.QtCore import QObject
 from qgis.core import (
-    Qgis,QgsApplication
+    Qgis,QgsApplication,QgsProject
 )
+import os
 from . import domainGeometry
 from . import meshElements
 from . import meshConnectivity
@@ -76,6 +77,26 @@ class pluginPK5mesher:
         self.mesh_button.setMenu(menu)
         self.toolbar.addWidget(self.mesh_button)        
 
+        ################ Boton formato de la capa de malla
+        self.format_button = QToolButton()
+        self.format_button.setText(tools.meshLayerDriver())
+        self.format_button.setToolTip("Output format of the mesh layer")
+        self.format_button.setPopupMode(QToolButton.MenuButtonPopup)
+
+        format_menu = QMenu()
+        for driver in tools.MESH_LAYER_DRIVERS:
+            action = QAction(driver, self.iface.mainWindow())
+            action.triggered.connect(lambda checked=False, d=driver: self.set_mesh_driver(d))
+            format_menu.addAction(action)
+
+        format_menu.addSeparator()
+        self.action_mesh_copy = QAction("Export FlatGeobuf copy", self.iface.mainWindow())
+        self.action_mesh_copy.triggered.connect(self.export_mesh_copy)
+        format_menu.addAction(self.action_mesh_copy)
+
+        self.format_button.setMenu(format_menu)
+        self.toolbar.addWidget(self.format_button)
+
 
         ################ Botón DOMAIN
         self.action_domain = QAction("DOMAIN", self.iface.mainWindow())
@@ -126,6 +147,22 @@ class pluginPK5mesher:
         self.toolbar.addAction(self.action_export)              
 
 
+    def set_mesh_driver(self, driver):
+        tools.setMeshLayerDriver(driver)
+        self.format_button.setText(driver)
+
+        msg=f"Selected mesh layer format: {driver} (applied when the mesh layer is generated)"    
+        log_info(msg)
+
+
+    def export_mesh_copy(self):
+        project_folder = os.path.dirname(QgsProject.instance().fileName())
+        copy_path = tools.writeMeshCopy(project_folder)
+        if copy_path:
+            msg=f"FlatGeobuf copy of the mesh layer written: {copy_path}"
+            log_info(msg)
+
+
     def set_mesh_type(self, mesh_type):
         self.mesh_type = mesh_type
 
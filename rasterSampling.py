@@ -0,0 +1,322 @@
+######################## PeKa2D-v5 Graphical User Interface (GUI) #########################
+
+# PeKa2D-v5 GUI plugin for QGIS 3
+# © 2025 Sergio Martínez-Aranda. License CC BY-NC-SA 4.0
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+
+###########################################################################################
+
+from qgis.core import (
+    Qgis,
+    QgsRectangle,
+    QgsFeatureRequest
+)
+import numpy as np
+from .tools import meshCentroids, meshCellGeometry
+
+
+# Raster tiles are read in blocks of TILE_SIZE x TILE_SIZE pixels
+TILE_SIZE = 1024
+
+# Zonal batches are limited to this number of sub-pixel samples
+ZONAL_BATCH_SAMPLES = 4000000
+
+# Sub-pixel samples per pixel side for the area-weighted zonal mean
+ZONAL_SUBPIXELS = 4
+
+# Zonal statistics computed over the pixels covered by each cell
+ZONAL_STATISTICS = {
+    "Zonal mean": "mean",
+    "Zonal min": "min",
+    "Zonal max": "max",
+    "Zonal area-weighted": "area",
+}
+
+# Raster sampling methods available in the dialogs
+SAMPLING_METHODS = ["Nearest", "Bilinear"] + list(ZONAL_STATISTICS)
+
+# QGIS raster data types mapped to numpy dtypes
+QGIS_NUMPY_DTYPES = {
+    Qgis.Byte: np.uint8,
+    Qgis.UInt16: np.uint16,
+    Qgis.Int16: np.int16,
+    Qgis.UInt32: np.uint32,
+    Qgis.Int32: np.int32,
+    Qgis.Float32: np.float32,
+    Qgis.Float64: np.float64,
+}
+
+
+def meshPolygons(mesh):
+    """
+    Feature ids, centroids (n,2) and vertices (n,4,2) of the mesh layer cells.
+    Triangles are padded by repeating their last vertex.
+    """
+    cached = meshCellGeometry(mesh, vertices=True)
+    if cached is not None:
+        fids, geometry = cached
+        return fids, geometry["centroid"], geometry["vertices"]
+
+    fids = []
+    xy = []
+    verts = []
+    for feat in mesh.getFeatures(QgsFeatureRequest().setNoAttributes()):
+        geom = feat.geometry()
+        pt = geom.centroid().asPoint()
+        ring = geom.asMultiPolygon()[0][0] if geom.isMultipart() else geom.asPolygon()[0]
+        ring = [(p.x(), p.y()) for p in ring[:-1]]
+        ring = (ring + ring[-1:] * 4)[:4]
+        fids.append(feat.id())
+        xy.append((pt.x(), pt.y()))
+        verts.append(ring)
+
+    xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+    verts = np.asarray(verts, dtype=np.float64).reshape(-1, 4, 2)
+    return fids, xy, verts
+
+
+class rasterGrid:
+    """Pixel geometry of a raster band, used to map coordinates to pixels"""
+
+    def __init__(self, raster, band=1):
+        self.provider = raster.dataProvider()
+        self.band = band
+        extent = self.provider.extent()
+        self.xmin = extent.xMinimum()
+        self.ymax = extent.yMaximum()
+        self.ncols = self.provider.xSize()
+        self.nrows = self.provider.ySize()
+        self.dx = extent.width() / self.ncols
+        self.dy = extent.height() / self.nrows
+
+    def pixelCoords(self, xy):
+        """Continuous (col,row) coordinates; pixel centres lie at integer + 0.5"""
+        fx = (xy[:, 0] - self.xmin) / self.dx
+        fy = (self.ymax - xy[:, 1]) / self.dy
+        return fx, fy
+
+    def readBlock(self, c0, r0, ncols, nrows):
+        """Read a block of pixels as a float64 array with nodata set to NaN"""
+        extent = QgsRectangle(
+            self.xmin + c0 * self.dx, self.ymax - (r0 + nrows) * self.dy,
+            self.xmin + (c0 + ncols) * self.dx, self.ymax - r0 * self.dy
+        )
+        block = self.provider.block(self.band, extent, ncols, nrows)
+
+        dtype = QGIS_NUMPY_DTYPES.get(block.dataType())
+        if dtype is None or not block.isValid():
+            return np.full((nrows, ncols), np.nan)
+
+        data = np.frombuffer(bytes(block.data()), dtype=dtype).reshape(nrows, ncols)
+        data = data.astype(np.float64)
+        if block.hasNoDataValue():
+            data[data == block.noDataValue()] = np.nan
+
+        return data
+
+
+def sampleRaster(raster, xy, method="Nearest", band=1, default=0.0, tile=TILE_SIZE):
+    """
+    Sample a raster band at the points xy (n,2) reading it in tiles.
+
+    Points are grouped by the tile they fall in, so each tile holding at
+    least one point is read once and its values gathered vectorially.
+    Points outside the raster or on nodata pixels get the default value.
+    The Bilinear method interpolates between the 4 nearest pixel centres,
+    ignoring nodata neighbours.
+    """
+    grid = rasterGrid(raster, band)
+    fx, fy = grid.pixelCoords(xy)
+    values = np.full(len(xy), np.nan)
+
+    inside = (fx >= 0.0) & (fx < grid.ncols) & (fy >= 0.0) & (fy < grid.nrows)
+    idx = np.flatnonzero(inside)
+    if len(idx) == 0:
+        values[:] = default
+        return values
+
+    bilinear = method == "Bilinear"
+    if bilinear:
+        # Upper-left pixel of the 2x2 stencil, clamped at the raster border
+        c0 = np.clip(np.floor(fx[idx] - 0.5).astype(np.int64), 0, max(grid.ncols - 2, 0))
+        r0 = np.clip(np.floor(fy[idx] - 0.5).astype(np.int64), 0, max(grid.nrows - 2, 0))
+        wx = np.clip(fx[idx] - 0.5 - c0, 0.0, 1.0)
+        wy = np.clip(fy[idx] - 0.5 - r0, 0.0, 1.0)
+        halo = 1
+    else:
+        c0 = np.minimum(fx[idx].astype(np.int64), grid.ncols - 1)
+        r0 = np.minimum(fy[idx].astype(np.int64), grid.nrows - 1)
+        halo = 0
+
+    # Group the points by tile
+    ntx = (grid.ncols + tile - 1) // tile
+    tile_id = (r0 // tile) * ntx + (c0 // tile)
+    order = np.argsort(tile_id, kind="stable")
+    tiles, starts = np.unique(tile_id[order], return_index=True)
+    ends = np.append(starts[1:], len(order))
+
+    for t, a, b in zip(tiles.tolist(), starts.tolist(), ends.tolist()):
+        pts = order[a:b]
+        tc0 = (t % ntx) * tile
+        tr0 = (t // ntx) * tile
+        bw = min(tile + halo, grid.ncols - tc0)
+        bh = min(tile + halo, grid.nrows - tr0)
+        data = grid.readBlock(tc0, tr0, bw, bh)
+
+        lc = c0[pts] - tc0
+        lr = r0[pts] - tr0
+        if not bilinear:
+            values[idx[pts]] = data[lr, lc]
+            continue
+
+        lc1 = np.minimum(lc + 1, bw - 1)
+        lr1 = np.minimum(lr + 1, bh - 1)
+        stencil = np.stack([data[lr, lc], data[lr, lc1], data[lr1, lc], data[lr1, lc1]], axis=1)
+        ax = wx[pts]
+        ay = wy[pts]
+        weights = np.stack([(1 - ax) * (1 - ay), ax * (1 - ay), (1 - ax) * ay, ax * ay], axis=1)
+
+        valid = ~np.isnan(stencil)
+        weights = np.where(valid, weights, 0.0)
+        wsum = weights.sum(axis=1)
+        num = (np.where(valid, stencil, 0.0) * weights).sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values[idx[pts]] = np.where(wsum > 0.0, num / wsum, np.nan)
+
+    values[np.isnan(values)] = default
+    return values
+
+
+def zonalRaster(raster, verts, statistic="mean", band=1, subpixels=ZONAL_SUBPIXELS,
+                tile=TILE_SIZE, max_samples=ZONAL_BATCH_SAMPLES):
+    """
+    Zonal statistic (mean, min, max or area) of a raster band over the
+    convex cells verts (n,4,2). Cells are rasterized against the pixel grid
+    in batches grouped by tile: every pixel centre inside a cell counts as
+    one sample. The area statistic uses a sub-pixel grid so each pixel is
+    weighted by the fraction of it covered by the cell.
+
+    Returns NaN for cells covering no valid pixel centre.
+    """
+    grid = rasterGrid(raster, band)
+    ncells = len(verts)
+    s = subpixels if statistic == "area" else 1
+
+    # Cell vertices in sub-pixel coordinates
+    fx, fy = grid.pixelCoords(verts.reshape(-1, 2))
+    px = (fx * s).reshape(ncells, 4)
+    py = (fy * s).reshape(ncells, 4)
+
+    # Range of sample points (u+0.5, v+0.5) inside each cell bounding box
+    u0 = np.maximum(np.ceil(px.min(axis=1) - 0.5), 0).astype(np.int64)
+    u1 = np.minimum(np.floor(px.max(axis=1) - 0.5), grid.ncols * s - 1).astype(np.int64)
+    v0 = np.maximum(np.ceil(py.min(axis=1) - 0.5), 0).astype(np.int64)
+    v1 = np.minimum(np.floor(py.max(axis=1) - 0.5), grid.nrows * s - 1).astype(np.int64)
+    nu = np.maximum(u1 - u0 + 1, 0)
+    nv = np.maximum(v1 - v0 + 1, 0)
+    nsamples = nu * nv
+
+    # Cell orientation, so the inside test works for both windings
+    ex = np.roll(px, -1, axis=1) - px
+    ey = np.roll(py, -1, axis=1) - py
+    orient = np.sign((px * np.roll(py, -1, axis=1) - np.roll(px, -1, axis=1) * py).sum(axis=1))
+
+    total = np.zeros(ncells)
+    count = np.zeros(ncells, dtype=np.int64)
+    result = np.full(ncells, np.nan)
+    if statistic == "min":
+        result[:] = np.inf
+    elif statistic == "max":
+        result[:] = -np.inf
+
+    # Batches: cells grouped by tile, then split to bound the number of samples
+    ntx = (grid.ncols + tile - 1) // tile
+    cells = np.flatnonzero(nsamples > 0)
+    tile_id = (v0[cells] // (tile * s)) * ntx + (u0[cells] // (tile * s))
+    cells = cells[np.argsort(tile_id, kind="stable")]
+    tile_id = np.sort(tile_id, kind="stable")
+
+    batches = []
+    for a, b in zip(*_runs(tile_id)):
+        csum = np.cumsum(nsamples[cells[a:b]])
+        cuts = np.searchsorted(csum, np.arange(max_samples, csum[-1], max_samples), side="right")
+        bounds = [0] + np.unique(np.maximum(cuts, 1)).tolist() + [b - a]
+        batches += [cells[a + i:a + j] for i, j in zip(bounds[:-1], bounds[1:]) if j > i]
+
+    for batch in batches:
+        n = nsamples[batch]
+        starts = np.cumsum(n) - n
+        local = np.arange(n.sum()) - np.repeat(starts, n)
+        owner = np.repeat(np.arange(len(batch)), n)
+        cell = batch[owner]
+        u = u0[cell] + local % nu[cell]
+        v = v0[cell] + local // nu[cell]
+
+        # Keep the samples inside the cell (all edge cross products >= 0)
+        qx = u + 0.5
+        qy = v + 0.5
+        inside = np.ones(len(u), dtype=bool)
+        for k in range(4):
+            cross = ex[cell, k] * (qy - py[cell, k]) - ey[cell, k] * (qx - px[cell, k])
+            inside &= cross * orient[cell] >= -1e-9
+        owner = owner[inside]
+        cell = cell[inside]
+        col = u[inside] // s
+        row = v[inside] // s
+        if len(cell) == 0:
+            continue
+
+        # Read the pixels covered by the batch at once
+        c0, r0 = col.min(), row.min()
+        data = grid.readBlock(int(c0), int(r0), int(col.max() - c0 + 1), int(row.max() - r0 + 1))
+        values = data[row - r0, col - c0]
+        valid = ~np.isnan(values)
+        owner = owner[valid]
+        cell = cell[valid]
+        values = values[valid]
+
+        # Each cell belongs to a single batch: accumulate on the batch cells only
+        count[batch] += np.bincount(owner, minlength=len(batch))
+        if statistic == "min":
+            np.minimum.at(result, cell, values)
+        elif statistic == "max":
+            np.maximum.at(result, cell, values)
+        else:
+            total[batch] += np.bincount(owner, weights=values, minlength=len(batch))
+
+    if statistic in ("mean", "area"):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = total / count
+    result[count == 0] = np.nan
+    return result
+
+
+def _runs(keys):
+    """Start and end positions of the runs of equal values in a sorted array"""
+    if len(keys) == 0:
+        return [], []
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.append(starts[1:], len(keys))
+    return starts.tolist(), ends.tolist()
+
+
+def sampleMeshFromRasters(mesh, rasters, method="Nearest", default=0.0):
+    """
+    Sample one value per mesh cell from each raster with the given method.
+    Zonal methods fall back to the centroid value for cells smaller than
+    a pixel. Returns the feature ids and one array of values per raster.
+    """
+    if method not in ZONAL_STATISTICS:
+        fids, xy = meshCentroids(mesh)
+        return fids, [sampleRaster(raster, xy, method, default=default) for raster in rasters]
+
+    fids, xy, verts = meshPolygons(mesh)
+    columns = []
+    for raster in rasters:
+        values = zonalRaster(raster, verts, ZONAL_STATISTICS[method])
+        missing = np.isnan(values)
+        if missing.any():
+            values[missing] = sampleRaster(raster, xy[missing], "Nearest", default=default)
+        columns.append(values)
+
+    return fids, columns
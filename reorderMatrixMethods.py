@@ -13,7 +13,11 @@ import numpy as np
 import math
 from collections import defaultdict
 from scipy.sparse import csr_matrix
-from scipy.sparse.csgraph import reverse_cuthill_mckee
+from scipy.sparse.csgraph import (
+    reverse_cuthill_mckee,
+    breadth_first_order,
+    connected_components
+)
 from .messages import (
     log_info,
     log_error,
@@ -21,17 +25,16 @@ from .messages import (
 )
 
 def buildCellConnectivityFromNeighbors(neighbors, ncells):
-    rows = []
-    cols = []
-
-    for n in neighbors:
-        i = n["c1"]
-        j = n["c2"]
+    """
+    Symmetric cell connectivity matrix (CSR) built from the calculus wall table.
+    """
+    c1 = neighbors["c1"]
+    c2 = neighbors["c2"]
 
-        rows.extend([i, j])
-        cols.extend([j, i])
+    rows = np.concatenate((c1, c2))
+    cols = np.concatenate((c2, c1))
 
-    data = [1] * len(rows)
+    data = np.ones(len(rows), dtype=np.int8)
     A = csr_matrix((data, (rows, cols)), shape=(ncells, ncells))
 
     return A
@@ -45,34 +48,264 @@ def computeRCMpermutation(neighbors, ncells):
    
     return perm, inv_perm
 
-def reorderRCMelements(elements, perm):
-    return [elements[p] for p in perm]
-
 
 def reorderRCMneighbors(neighbors, inv_perm):
-    new_neighbors = []
-
-    for n in neighbors:
-        new_neighbors.append({
-            "c1": inv_perm[n["c1"]],
-            "c2": inv_perm[n["c2"]],
-            "iw1": inv_perm[n["iw1"]],
-            "iw2": inv_perm[n["iw2"]],
-            "n1": inv_perm[n["n1"]],
-            "n2": inv_perm[n["n2"]],
-        })
+    """
+    Permute the calculus wall table with inv_perm (old cell -> new cell).
+    Only cell columns change; node ids and local wall indices are kept. Walls
+    are re-oriented so that c1 < c2 and sorted by (c1, c2), as buildNeighbornCells does.
+    """
+    c1 = inv_perm[neighbors["c1"]]
+    c2 = inv_perm[neighbors["c2"]]
+    swap = c1 > c2
+
+    new_neighbors = np.empty_like(neighbors)
+    new_neighbors["c1"] = np.where(swap, c2, c1)
+    new_neighbors["c2"] = np.where(swap, c1, c2)
+    new_neighbors["iw1"] = np.where(swap, neighbors["iw2"], neighbors["iw1"])
+    new_neighbors["iw2"] = np.where(swap, neighbors["iw1"], neighbors["iw2"])
+    new_neighbors["n1"] = neighbors["n1"]
+    new_neighbors["n2"] = neighbors["n2"]
+
+    order = np.lexsort((new_neighbors["c2"], new_neighbors["c1"]))
+    return new_neighbors[order]
+
+
+def renumberNeighborNodes(neighbors, mesh, node_perm):
+    """
+    Rewrite wall node ids after mesh.renumberNodes(node_perm) (new ids 1..nnodes).
+    """
+    inv = np.empty(mesh.nnodes, dtype=np.int64)
+    inv[node_perm] = np.arange(1, mesh.nnodes + 1)
+
+    n1 = inv[mesh.nodeIndex(neighbors["n1"])]
+    n2 = inv[mesh.nodeIndex(neighbors["n2"])]
+
+    new_neighbors = neighbors.copy()
+    new_neighbors["n1"] = np.minimum(n1, n2)
+    new_neighbors["n2"] = np.maximum(n1, n2)
 
     return new_neighbors
 
 
-def applyRCMreordering(elements, neighbors):
-    # --- RCM ---
-    ncells = len(elements)
-    perm, inv_perm = computeRCMpermutation(neighbors, ncells)
+# ---------------------------------------------------------------
+# Reordering strategies: f(mesh, neighbors, nparts) -> perm
+# perm[new] = old cell index
+# ---------------------------------------------------------------
+
+def rcmStrategy(mesh, neighbors, nparts=1):
+    perm, inv_perm = computeRCMpermutation(neighbors, mesh.ncells)
+    return perm
+
+
+def greedyBFSStrategy(mesh, neighbors, nparts=1):
+    """
+    Breadth-first traversal of the cell graph, starting every connected
+    component at its lowest-degree cell.
+    """
+    ncells = mesh.ncells
+    A = buildCellConnectivityFromNeighbors(neighbors, ncells)
+    degree = np.diff(A.indptr)
+    ncomp, labels = connected_components(A, directed=False)
+
+    # lowest-degree cell of every component
+    order = np.lexsort((degree, labels))
+    comp, first = np.unique(labels[order], return_index=True)
+    seeds = order[first]
+
+    perm = [breadth_first_order(A, seed, directed=False, return_predecessors=False) for seed in seeds]
+    return np.concatenate(perm).astype(np.int64)
+
+
+def mortonStrategy(mesh, neighbors, nparts=1):
+    """
+    Z-order (Morton) space-filling curve over the cell centroids.
+    """
+    ix, iy = quantizeCentroids(mesh.cellCentroids())
+    key = spreadBits(ix) | (spreadBits(iy) << np.uint64(1))
+    return np.argsort(key, kind="stable")
+
+
+def hilbertStrategy(mesh, neighbors, nparts=1):
+    """
+    Hilbert space-filling curve over the cell centroids.
+    """
+    ix, iy = quantizeCentroids(mesh.cellCentroids())
+    key = hilbertIndex(ix, iy)
+    return np.argsort(key, kind="stable")
+
+
+def partitionRCMStrategy(mesh, neighbors, nparts=8):
+    """
+    Recursive coordinate bisection of the centroids into nparts blocks,
+    then RCM inside every block. Blocks are consecutive in the new order.
+    """
+    A = buildCellConnectivityFromNeighbors(neighbors, mesh.ncells)
+    parts = recursiveBisection(mesh.cellCentroids(), nparts)
+
+    perm = []
+    for idx in parts:
+        sub = A[idx][:, idx]
+        local = reverse_cuthill_mckee(sub, symmetric_mode=True)
+        perm.append(idx[local])
+
+    return np.concatenate(perm).astype(np.int64)
+
+
+REORDER_STRATEGIES = {
+    "RCM": rcmStrategy,
+    "Hilbert": hilbertStrategy,
+    "Morton": mortonStrategy,
+    "Greedy-BFS": greedyBFSStrategy,
+    "Partition+RCM": partitionRCMStrategy
+}
+
+
+def computeReorderPermutation(strategy, mesh, neighbors, nparts=8):
+    if strategy not in REORDER_STRATEGIES:
+        raise ValueError(f"Non supported reordering strategy: {strategy}")
+
+    perm = np.asarray(REORDER_STRATEGIES[strategy](mesh, neighbors, nparts), dtype=np.int64)
+    if perm.size != mesh.ncells:
+        raise RuntimeError(f"{strategy} reordering returned {perm.size} cells, expected {mesh.ncells}")
+
+    return perm
+
+
+def applyReordering(mesh, neighbors, strategy="RCM", nparts=8):
+    perm = computeReorderPermutation(strategy, mesh, neighbors, nparts)
+    return mesh.permuteCells(perm), perm
+
+
+# ---------------------------------------------------------------
+# Node renumbering strategies: f(mesh) -> node_perm
+# node_perm[new] = old node row
+# ---------------------------------------------------------------
+
+def firstTouchNodeStrategy(mesh):
+    """
+    Nodes numbered in the order they are first read when cells are visited
+    in their current order. Unused nodes go last.
+    """
+    idx = mesh.nodeIndex(mesh.cells[mesh.cells >= 0])  # row-major = visiting order
+    touched, first = np.unique(idx, return_index=True)
+    order = touched[np.argsort(first, kind="stable")]
+
+    unused = np.setdiff1d(np.arange(mesh.nnodes), touched, assume_unique=True)
+    return np.concatenate((order, unused)).astype(np.int64)
+
+
+def nodeRCMStrategy(mesh):
+    """
+    RCM on the node graph (nodes connected by cell edges).
+    """
+    cells = mesh.cells
+    k = cells.shape[1]
+    nv = np.count_nonzero(cells >= 0, axis=1)
+    j = np.arange(k)
+    valid = j < nv[:, None]
+    nxt = cells[np.arange(mesh.ncells)[:, None], (j + 1) % nv[:, None]]
+
+    p1 = mesh.nodeIndex(cells[valid])
+    p2 = mesh.nodeIndex(nxt[valid])
+    data = np.ones(2 * len(p1), dtype=np.int8)
+    A = csr_matrix((data, (np.concatenate((p1, p2)), np.concatenate((p2, p1)))), shape=(mesh.nnodes, mesh.nnodes))
+
+    return reverse_cuthill_mckee(A, symmetric_mode=True).astype(np.int64)
+
+
+NODE_REORDER_STRATEGIES = {
+    "None": None,
+    "First-touch": firstTouchNodeStrategy,
+    "RCM": nodeRCMStrategy
+}
+
+
+def applyNodeReordering(mesh, strategy="First-touch"):
+    if strategy not in NODE_REORDER_STRATEGIES:
+        raise ValueError(f"Non supported node reordering strategy: {strategy}")
+
+    func = NODE_REORDER_STRATEGIES[strategy]
+    if func is None:
+        return mesh, None
+
+    node_perm = func(mesh)
+    return mesh.renumberNodes(node_perm), node_perm
+
+
+# ---------------------------------------------------------------
+# Geometric helpers
+# ---------------------------------------------------------------
+
+def quantizeCentroids(xy, bits=16):
+    """
+    Map XY coordinates to integers in [0, 2^bits) over the mesh bounding box.
+    """
+    lo = xy.min(axis=0)
+    extent = max(float((xy.max(axis=0) - lo).max()), 1e-12)  # same scale in x and y
+    scale = (2**bits - 1) / extent
+    q = ((xy - lo) * scale).astype(np.uint64)
+    return q[:, 0], q[:, 1]
+
+
+def spreadBits(v):
+    """
+    Insert a zero bit between the 32 low bits of v (Morton interleaving).
+    """
+    v = v.astype(np.uint64) & np.uint64(0xFFFFFFFF)
+    v = (v | (v << np.uint64(16))) & np.uint64(0x0000FFFF0000FFFF)
+    v = (v | (v << np.uint64(8))) & np.uint64(0x00FF00FF00FF00FF)
+    v = (v | (v << np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    v = (v | (v << np.uint64(2))) & np.uint64(0x3333333333333333)
+    v = (v | (v << np.uint64(1))) & np.uint64(0x5555555555555555)
+    return v
+
+
+def hilbertIndex(ix, iy, bits=16):
+    """
+    Hilbert curve distance of integer coordinates (vectorized xy2d).
+    """
+    x = ix.astype(np.int64)
+    y = iy.astype(np.int64)
+    n = 1 << bits
+    d = np.zeros(x.shape, dtype=np.int64)
+
+    s = n >> 1
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += s * s * ((3 * rx) ^ ry)
+
+        # rotate quadrant
+        flip = ~ry & rx
+        x = np.where(flip, n - 1 - x, x)
+        y = np.where(flip, n - 1 - y, y)
+        swap = ~ry
+        x, y = np.where(swap, y, x), np.where(swap, x, y)
+
+        s >>= 1
+
+    return d
+
 
-    # --- reordenar elementos ---
-    new_elements = reorderRCMelements(elements, perm)
-    # neighbors = reorderRCMneighbors(neighbors, inv_perm)
+def recursiveBisection(xy, nparts):
+    """
+    Split cells into nparts index blocks by recursive median cuts along the
+    longest bounding box axis.
+    """
+    parts = [np.arange(len(xy))]
+    while len(parts) < nparts:
+        # split the largest block
+        k = max(range(len(parts)), key=lambda i: len(parts[i]))
+        idx = parts.pop(k)
+        if len(idx) < 2:
+            parts.insert(k, idx)
+            break
 
-    return new_elements
+        pts = xy[idx]
+        axis = int(np.argmax(pts.max(axis=0) - pts.min(axis=0)))
+        order = np.argsort(pts[:, axis], kind="stable")
+        half = len(idx) // 2
+        parts[k:k] = [idx[order[:half]], idx[order[half:]]]
 
+    return parts
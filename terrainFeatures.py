@@ -10,7 +10,7 @@ from qgis.PyQt.QtWidgets import (
     QMessageBox,
     QInputDialog,
     QDialog, QVBoxLayout, QPushButton,
-    QCheckBox, QLabel
+    QCheckBox, QLabel, QComboBox
 )
 from qgis.core import (
     QgsProject, 
@@ -38,6 +38,10 @@ from PyQt5.QtCore import (
 )
 import os
 from . import tools
+from .rasterSampling import (
+    SAMPLING_METHODS,
+    sampleMeshFromRasters
+)
 from .messages import (
     log_info,
     log_error,
@@ -76,6 +80,12 @@ class terrainDialog(QDialog):
         self.raster_terrain_selector.setFilters(QgsMapLayerProxyModel.RasterLayer)
         self.raster_terrain_selector.setEnabled(False)  # deshabilitado hasta marcar el checkbox
         layout.addWidget(self.raster_terrain_selector)
+
+        # --- Método de muestreo del raster ---
+        self.terrain_method = QComboBox()
+        self.terrain_method.addItems(SAMPLING_METHODS)
+        self.terrain_method.setEnabled(False)
+        layout.addWidget(self.terrain_method)
  
         # --- Botón add bed_elevation_layer ---
         btn_add_bed = QPushButton("Add terrain elevation to mesh")
@@ -102,6 +112,12 @@ class terrainDialog(QDialog):
         self.raster_nmanning_selector.setFilters(QgsMapLayerProxyModel.RasterLayer)
         self.raster_nmanning_selector.setEnabled(False)  # deshabilitado hasta marcar el checkbox
         layout.addWidget(self.raster_nmanning_selector)
+
+        # --- Método de muestreo del raster ---
+        self.nmanning_method = QComboBox()
+        self.nmanning_method.addItems(SAMPLING_METHODS)
+        self.nmanning_method.setEnabled(False)
+        layout.addWidget(self.nmanning_method)
  
         # --- Botón add bed_elevation_layer ---
         btn_add_nman = QPushButton("Add  nManning roughness to mesh")
@@ -121,12 +137,14 @@ class terrainDialog(QDialog):
 
     def on_checkbox_terrain_changed(self, state):
         self.raster_terrain_selector.setEnabled(state == Qt.Checked)  # 2 = Qt.Checked   
+        self.terrain_method.setEnabled(state == Qt.Checked)
 
     def on_add_terrain_elevation(self):
         if self.checkbox_terrain.isChecked():
             raster = self.raster_terrain_selector.currentLayer()
+            method = self.terrain_method.currentText()
             field_name = "zbed"
-            addFeatureToMeshFromRaster(raster,field_name)
+            addFeatureToMeshFromRaster(raster,field_name,method)
         else:
             layer_name = "terrainZ"
             field_name = "zbed"
@@ -147,12 +165,14 @@ class terrainDialog(QDialog):
 
     def on_checkbox_nmanning_changed(self, state):
         self.raster_nmanning_selector.setEnabled(state == Qt.Checked)  # 2 = Qt.Checked   
+        self.nmanning_method.setEnabled(state == Qt.Checked)
 
     def on_add_nmanning(self):
         if self.checkbox_nmanning.isChecked():
             raster = self.raster_nmanning_selector.currentLayer()
+            method = self.nmanning_method.currentText()
             field_name = "nman"
-            addFeatureToMeshFromRaster(raster,field_name)
+            addFeatureToMeshFromRaster(raster,field_name,method)
         else:
             layer_name = "nManning"
             field_name = "nman"
@@ -221,7 +241,7 @@ def addFeatureToMesh(layer_name,field_name):
     project_folder = os.path.dirname(project_path)
 
     # Mesh layer
-    mesh_path = os.path.join(project_folder, "mesh.shp")
+    mesh_path = tools.meshLayerPath(project_folder)
     mesh = QgsVectorLayer(mesh_path, "mesh", "ogr")
     if not mesh.isValid():
         log_error("Domain mesh not found or invalid")
@@ -230,76 +250,41 @@ def addFeatureToMesh(layer_name,field_name):
     # Source layer
     source_path = os.path.join(project_folder, f"{layer_name}.shp")
     source = QgsVectorLayer(source_path, layer_name, "ogr")
-    source_polygons = list(source.getFeatures())  # orden de la capa
 
     # New mesh field
-    if field_name not in [f.name() for f in mesh.fields()]:
-        mesh.startEditing()
-        mesh.addAttribute(QgsField(field_name, QVariant.Double))
-        mesh.updateFields()
-        mesh.commitChanges()
-
-    # Sample new mesh values
-    mesh.startEditing()
-    for feat in mesh.getFeatures():
-        centroid = feat.geometry().centroid()
-
-        val = None
-        for pol in source_polygons:
-            if pol.geometry().contains(centroid):
-                val = pol[field_name]
-
-        if val is not None:
-            feat[field_name] = val
-        else:
-            feat[field_name] = 0.0
-        
-        mesh.updateFeature(feat)
+    tools.addMeshFields(mesh, [field_name])
 
-    mesh.commitChanges()
+    # Sample new mesh values (last polygon in layer order wins)
+    fids, columns = tools.polygonOverlay(mesh, source, [field_name])
+
+    # Write all the values at once
+    tools.writeMeshFields(mesh, fids, columns)
 
     msg=f"Feature {field_name} added to mesh layer"
     log_info(msg)
 
 
-def addFeatureToMeshFromRaster(raster,field_name):
+def addFeatureToMeshFromRaster(raster,field_name,method="Nearest"):
 
     # Project folder
     project_path = QgsProject.instance().fileName()
     project_folder = os.path.dirname(project_path)
 
     # Mesh layer
-    mesh_path = os.path.join(project_folder, "mesh.shp")
+    mesh_path = tools.meshLayerPath(project_folder)
     mesh = QgsVectorLayer(mesh_path, "mesh", "ogr")
     if not mesh.isValid():
         log_error("Domain mesh not found or invalid")
         return
     
-    # Get raster layer data
-    provider = raster.dataProvider()
-
     # New mesh field
-    if field_name not in [f.name() for f in mesh.fields()]:
-        mesh.startEditing()
-        mesh.addAttribute(QgsField(field_name, QVariant.Double))
-        mesh.updateFields()
-        mesh.commitChanges()
-
-    # Sample new mesh values
-    mesh.startEditing()
-    for feat in mesh.getFeatures():
-        pt = feat.geometry().centroid().asPoint()
-        result = provider.sample(pt, 1)
-
-        if result[1]:  # ok
-            feat[field_name] = result[0]
-        else:
-            feat[field_name] = 0.0            
-        
-        mesh.updateFeature(feat)
+    tools.addMeshFields(mesh, [field_name])
 
+    # Sample new mesh values (centroid or zonal), reading the raster by tiles
+    fids, (values,) = sampleMeshFromRasters(mesh, [raster], method)
 
-    mesh.commitChanges()
+    # Write all the values at once
+    tools.writeMeshFields(mesh, fids, {field_name: values.tolist()})
 
     msg=f"Feature {field_name} sampled to mesh layer from raster"
     log_info(msg)
@@ -309,7 +294,7 @@ def reloadAndStyleMesh(var,iface):
     tools.remove_layer_by_name("mesh")
 
     project_folder = os.path.dirname(QgsProject.instance().fileName())
-    mesh_path = os.path.join(project_folder, "mesh.shp")
+    mesh_path = tools.meshLayerPath(project_folder)
     mesh = QgsVectorLayer(mesh_path, "mesh", "ogr")
     if not mesh.isValid():
         log_error("Domain mesh not found or invalid")
@@ -0,0 +1,42 @@
+######################## PeKa2D-v5 Graphical User Interface (GUI) #########################
+
+# PeKa2D-v5 GUI plugin for QGIS 3
+# © 2025 Sergio Martínez-Aranda. License CC BY-NC-SA 4.0
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+
+###########################################################################################
+
+# Outside the QGIS Python, qgis.* and PyQt5.* are replaced by mock modules so
+# the plugin modules import and their NumPy code paths can be tested. Under
+# QGIS the real modules are used.
+
+import importlib.abc
+import importlib.machinery
+import importlib.util
+import sys
+from unittest import mock
+
+STUBBED_PACKAGES = ("qgis", "PyQt5")
+
+
+class _stubFinder(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    """Import any qgis.*/PyQt5.* module as a MagicMock"""
+
+    def find_spec(self, name, path, target=None):
+        if name.split(".")[0] in STUBBED_PACKAGES:
+            return importlib.machinery.ModuleSpec(name, self, is_package=True)
+        return None
+
+    def create_module(self, spec):
+        module = mock.MagicMock()
+        module.__name__ = spec.name
+        module.__spec__ = spec
+        module.__path__ = []
+        return module
+
+    def exec_module(self, module):
+        pass
+
+
+if importlib.util.find_spec("qgis") is None:
+    sys.meta_path.insert(0, _stubFinder())
@@ -0,0 +1,65 @@
+######################## PeKa2D-v5 Graphical User Interface (GUI) #########################
+
+# PeKa2D-v5 GUI plugin for QGIS 3
+# © 2025 Sergio Martínez-Aranda. License CC BY-NC-SA 4.0
+# To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/
+
+###########################################################################################
+
+# Golden-file check of the .FED writer: the output is the input contract of
+# the PeKa2D-v5 solver and must not change. tests/data/<mesh_type>.FED were
+# written by the original line-by-line writer from tests/data/<mesh_type>.msh
+# and the cell fields below. Run with pytest tests (QGIS is stubbed out by
+# conftest.py when not available).
+
+import gzip
+import importlib
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+PLUGIN_DIR = Path(__file__).resolve().parents[1]
+DATA_DIR = Path(__file__).resolve().parent / "data"
+
+sys.path.insert(0, str(PLUGIN_DIR.parent))
+generatePK5files = importlib.import_module(f"{PLUGIN_DIR.name}.generatePK5files")
+meshAttributes = importlib.import_module(f"{PLUGIN_DIR.name}.meshAttributes")
+
+
+def cellFields(ncells):
+    k = np.arange(ncells)
+    return {"zbed": 250.0 + 0.3337 * k, "nman": 0.025 + 0.00125 * k, "hini": 0.1 * (k % 3)}
+
+
+def writeProject(folder, mesh_type, ncells):
+    """Project folder with the test mesh and its cell fields in the attribute store"""
+    shutil.copy(DATA_DIR / f"{mesh_type}.msh", folder / "mesh.msh")
+    meshAttributes.writeAttributes(str(folder), np.arange(ncells), cellFields(ncells))
+    # All fields are in the attribute store: the mesh layer is never opened
+    return str(folder / "mesh.msh"), str(folder / "mesh.gpkg")
+
+
+@pytest.mark.parametrize("mesh_type, ncells", [("triangle", 12), ("quad", 6)])
+def test_fed_golden(tmp_path, mesh_type, ncells):
+    msh_path, shp_path = writeProject(tmp_path, mesh_type, ncells)
+    fed_path = tmp_path / "case.FED"
+
+    generatePK5files.createFEDfile(msh_path, shp_path, str(fed_path), mesh_type)
+
+    expected = (DATA_DIR / f"{mesh_type}.FED").read_bytes()
+    assert fed_path.read_bytes() == expected
+
+
+@pytest.mark.parametrize("mesh_type, ncells", [("triangle", 12), ("quad", 6)])
+def test_fed_golden_gzip(tmp_path, mesh_type, ncells):
+    msh_path, shp_path = writeProject(tmp_path, mesh_type, ncells)
+    fed_path = tmp_path / "case.FED"
+
+    generatePK5files.createFEDfile(msh_path, shp_path, str(fed_path), mesh_type, compression="gzip")
+
+    expected = (DATA_DIR / f"{mesh_type}.FED").read_bytes()
+    with gzip.open(tmp_path / "case.FED.gz", "rb") as f:
+        assert f.read() == expected
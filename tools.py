@@ -10,14 +10,117 @@ from qgis.core import (
     QgsProject, QgsVectorLayer, QgsField, QgsVectorFileWriter, QgsPointXY, QgsFeature, QgsGeometry,
     QgsSimpleFillSymbolLayer, QgsFillSymbol, QgsLineSymbol, QgsSingleSymbolRenderer, QgsUnitTypes,
     QgsGraduatedSymbolRenderer, QgsStyle,
-    QgsSymbol, QgsRendererRange, QgsClassificationEqualInterval
+    QgsSymbol, QgsRendererRange, QgsClassificationEqualInterval,
+    QgsSpatialIndex, QgsFeatureRequest, QgsPoint, QgsRectangle, QgsVectorDataProvider
 )
 from qgis.PyQt.QtGui import QColor
-from PyQt5.QtCore import QVariant
+from PyQt5.QtCore import QVariant, QSettings
 import os
 import glob
 import time
 import meshio
+import numpy as np
+from matplotlib.path import Path
+from .meshData import loadMesh, loadCellGeometry
+from .meshAttributes import writeAttributes
+from .messages import log_warning
+
+
+# Output drivers of the mesh layer -> (file extension, OGR layer creation options).
+# The mesh layer is edited in place (new fields, attribute updates), so only
+# drivers supporting that are offered; FlatGeobuf is written as a read copy.
+MESH_LAYER_DRIVERS = {
+    "GPKG": (".gpkg", ["SPATIAL_INDEX=YES"]),
+    "ESRI Shapefile": (".shp", []),
+}
+
+# Files of a mesh layer written with each driver (sidecars included)
+MESH_LAYER_FILES = {
+    "GPKG": [".gpkg", ".gpkg-wal", ".gpkg-shm"],
+    "ESRI Shapefile": [".shp", ".shx", ".dbf", ".prj", ".cpg", ".qix"],
+}
+
+# Read-only FlatGeobuf copy of the mesh layer, for fast streaming reads
+MESH_COPY_DRIVER = "FlatGeobuf"
+MESH_COPY_FILE = "mesh.fgb"
+
+MESH_LAYER_SETTINGS = "gmshMesherPK5/MeshLayer"
+
+
+def meshLayerDriver():
+    """Output driver of the mesh layer selected by the user (GPKG by default)"""
+    driver = QSettings().value(f"{MESH_LAYER_SETTINGS}/driver", "GPKG")
+    return driver if driver in MESH_LAYER_DRIVERS else "GPKG"
+
+
+def setMeshLayerDriver(driver):
+    QSettings().setValue(f"{MESH_LAYER_SETTINGS}/driver", driver)
+
+
+def meshLayerPath(project_folder, existing=True):
+    """
+    Path of the mesh layer file for the selected driver. If existing is True
+    and that file does not exist, the mesh layer written with any other
+    driver is returned instead.
+    """
+    ext, _ = MESH_LAYER_DRIVERS[meshLayerDriver()]
+    path = os.path.join(project_folder, f"mesh{ext}")
+    if existing and not os.path.exists(path):
+        for other_ext, _ in MESH_LAYER_DRIVERS.values():
+            other = os.path.join(project_folder, f"mesh{other_ext}")
+            if os.path.exists(other):
+                return other
+    return path
+
+
+def removeOtherMeshLayers(project_folder, driver):
+    """
+    Delete the mesh layer files written with drivers other than driver, so
+    a stale layer is never picked up after switching formats. Files are
+    removed by explicit extension (a mesh.* glob would also take mesh.msh).
+    """
+    for other, extensions in MESH_LAYER_FILES.items():
+        if other == driver:
+            continue
+        for ext in extensions:
+            path = os.path.join(project_folder, f"mesh{ext}")
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def writeMeshCopy(project_folder):
+    """
+    Write the FlatGeobuf read copy of the mesh layer, with all its fields.
+    The working mesh layer is not changed. Returns the copy path or None.
+    """
+    mesh = QgsVectorLayer(meshLayerPath(project_folder), "mesh", "ogr")
+    if not mesh.isValid():
+        msg=f"Mesh layer not found: generate the mesh first"
+        log_warning(msg)
+        return None
+
+    copy_path = os.path.join(project_folder, MESH_COPY_FILE)
+    options = QgsVectorFileWriter.SaveVectorOptions()
+    options.driverName = MESH_COPY_DRIVER
+    options.fileEncoding = "UTF-8"
+    options.layerOptions = ["SPATIAL_INDEX=YES"]
+
+    error = QgsVectorFileWriter.writeAsVectorFormatV3(
+        mesh, copy_path, QgsProject.instance().transformContext(), options
+    )
+    if error[0] != QgsVectorFileWriter.NoError:
+        msg=f"FlatGeobuf copy of the mesh layer could not be written: {error[1]}"
+        log_warning(msg)
+        return None
+
+    return copy_path
+
+
+def meshFidOffset(mesh):
+    """Feature id of the first mesh cell (0 for Shapefile, 1 for GPKG)"""
+    for feat in mesh.getFeatures(QgsFeatureRequest().setNoAttributes().setLimit(1)):
+        return feat.id()
+    return 0
 
 
 def remove_layer_by_name(layer_name):
@@ -48,6 +151,153 @@ def wait_for_shapefile(shp_path, timeout=3):
     return False   
 
 
+def addMeshFields(mesh, field_names):
+    """Add the missing Double fields to the mesh layer through its provider"""
+    existing = mesh.fields().names()
+    new_fields = [QgsField(name, QVariant.Double) for name in field_names if name not in existing]
+    if new_fields and not mesh.dataProvider().capabilities() & QgsVectorDataProvider.AddAttributes:
+        msg=f"Mesh layer format does not support new fields: values kept in the attribute store only"
+        log_warning(msg)
+        return
+    if new_fields:
+        mesh.dataProvider().addAttributes(new_fields)
+        mesh.updateFields()
+
+
+def writeMeshFields(mesh, fids, values):
+    """
+    Bulk write of per-cell values. values is a dict {field_name: sequence
+    aligned with fids}. The values go to the columnar attribute store (the
+    source of truth, keyed by cell idx = fid - first fid) and then to the
+    mesh layer view with a single changeAttributeValues call.
+    """
+    project_folder = os.path.dirname(mesh.source().split("|")[0])
+    cells = np.asarray(fids, dtype=np.int64) - meshFidOffset(mesh)
+    writeAttributes(project_folder, cells, values)
+
+    if not mesh.dataProvider().capabilities() & QgsVectorDataProvider.ChangeAttributeValues:
+        return False
+
+    fields = mesh.fields()
+    columns = [(fields.indexOf(name), list(column)) for name, column in values.items()]
+
+    changes = {}
+    for k, fid in enumerate(fids):
+        changes[fid] = {idx: column[k] for idx, column in columns}
+
+    return mesh.dataProvider().changeAttributeValues(changes)
+
+
+def meshCellGeometry(mesh, vertices=False):
+    """
+    Cached cell geometry of a mesh layer, read from the mesh.msh next to it.
+    Returns the feature ids and the geometry dict (plus the cell vertices
+    if requested), or None if there is no mesh.msh matching the layer.
+    """
+    layer_path = mesh.source().split("|")[0]
+    msh_path = os.path.join(os.path.dirname(layer_path), "mesh.msh")
+    if not os.path.exists(msh_path):
+        return None
+
+    geometry = loadCellGeometry(msh_path)
+    ncells = len(geometry["area"])
+    if ncells != mesh.featureCount():
+        return None
+
+    # Feature ids follow the mesh layer order
+    offset = meshFidOffset(mesh)
+    fids = list(range(offset, offset + ncells))
+    if vertices:
+        geometry = dict(geometry, vertices=loadMesh(msh_path).cellVertices(geometry["cell"]))
+
+    return fids, geometry
+
+
+def meshCentroids(mesh):
+    """Feature ids and centroid coordinates (n,2) of the mesh layer cells"""
+    cached = meshCellGeometry(mesh)
+    if cached is not None:
+        fids, geometry = cached
+        return fids, geometry["centroid"]
+
+    fids = []
+    xy = []
+    for feat in mesh.getFeatures(QgsFeatureRequest().setNoAttributes()):
+        pt = feat.geometry().centroid().asPoint()
+        fids.append(feat.id())
+        xy.append((pt.x(), pt.y()))
+
+    return fids, np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+
+
+def pointsInGeometry(geom, xy):
+    """
+    Vectorized point-in-polygon test of the points xy (n,2) against a
+    (multi)polygon geometry, holes excluded. Returns a boolean mask.
+    """
+    inside = np.zeros(len(xy), dtype=bool)
+    if len(xy) == 0 or geom.isEmpty():
+        return inside
+
+    bbox = geom.boundingBox()
+    cand = np.flatnonzero(
+        (xy[:, 0] >= bbox.xMinimum()) & (xy[:, 0] <= bbox.xMaximum()) &
+        (xy[:, 1] >= bbox.yMinimum()) & (xy[:, 1] <= bbox.yMaximum())
+    )
+    polygons = geom.asMultiPolygon() if geom.isMultipart() else [geom.asPolygon()]
+    for rings in polygons:
+        ring_paths = [Path([(p.x(), p.y()) for p in ring]) for ring in rings]
+        part = ring_paths[0].contains_points(xy[cand])
+        for hole in ring_paths[1:]:
+            part &= ~hole.contains_points(xy[cand])
+        inside[cand[part]] = True
+
+    return inside
+
+
+def polygonOverlay(mesh, source, field_names, default=0.0):
+    """
+    Assign source polygon attributes to every mesh cell whose centroid lies
+    inside the polygon. Candidates are found with a spatial index over the
+    source layer and tested against prepared geometries.
+
+    Priority rule for overlapping zones: the polygon that comes last in the
+    source layer order wins (zones drawn later overwrite earlier ones).
+    Cells outside every polygon get the default value.
+
+    Returns the mesh feature ids and a dict {field_name: values}.
+    """
+    # Source polygons: rank (layer order), prepared geometry and values. The
+    # geometry is kept next to its engine, which only holds a pointer into it
+    polygons = {}
+    index = QgsSpatialIndex()
+    for rank, pol in enumerate(source.getFeatures()):
+        geom = pol.geometry()
+        if geom.isEmpty():
+            continue
+        engine = QgsGeometry.createGeometryEngine(geom.constGet())
+        engine.prepareGeometry()
+        polygons[pol.id()] = (rank, engine, geom, [pol[name] for name in field_names])
+        index.addFeature(pol)
+
+    fids, xy = meshCentroids(mesh)
+    columns = {name: [] for name in field_names}
+    for x, y in xy.tolist():
+        centroid = QgsPoint(x, y)
+
+        values = None
+        candidates = [polygons[fid] for fid in index.intersects(QgsRectangle(x, y, x, y)) if fid in polygons]
+        for rank, engine, geom, pol_values in sorted(candidates, key=lambda c: c[0], reverse=True):
+            if engine.contains(centroid):
+                values = pol_values
+                break
+
+        for k, name in enumerate(field_names):
+            columns[name].append(values[k] if values is not None else default)
+
+    return fids, columns
+
+
 def createSimpleLineRenderer(edge_color, width=0.4, opacity=1.0):
     symbol = QgsLineSymbol.createSimple({
         "color": edge_color,